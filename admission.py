@@ -0,0 +1,123 @@
+"""
+🚦 Admission Control — a bounded, deadline-aware queue in front of inference
+============================================================================
+Without a limit, a burst of uploads all lands on the interpreters at once,
+everyone's latency grows until the app times out and retries, and the
+retries make it worse. Instead:
+
+  • at most `max_concurrent` predictions run at a time,
+  • at most `max_queue` more wait for a turn — anything beyond that gets an
+    immediate 503 with a Retry-After estimated from recent service times,
+  • a request whose deadline passes while it waits is dropped before it
+    reaches the model, since its client has already given up on it.
+
+Used only from the event loop thread, so no locking is needed.
+"""
+import asyncio
+import collections
+import math
+import time
+
+
+class Overloaded(RuntimeError):
+    """The inference queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy — retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(RuntimeError):
+    """The request's deadline passed before inference could start."""
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue      = max(0, max_queue)
+        self.active   = 0
+        self._waiters = collections.deque()   # futures, oldest first
+        self._service_seconds = None           # moving average of how long a slot is held
+        self.admitted  = 0
+        self.rejected  = 0
+        self.expired   = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained, for the Retry-After header."""
+        service = self._service_seconds or 1.0
+        waves = (self.queued + 1) / self.max_concurrent
+        return max(1, min(30, math.ceil(waves * service)))
+
+    async def acquire(self, deadline: float = None) -> float:
+        """
+        Wait for a free slot and return when it was granted (time.monotonic()).
+
+        `deadline` is a time.monotonic() value. Raises Overloaded when the
+        queue is full and DeadlineExceeded when the deadline passes first.
+        """
+        if deadline is not None and time.monotonic() >= deadline:
+            self.expired += 1
+            raise DeadlineExceeded("Deadline passed before the request was queued")
+
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return time.monotonic()
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            self.expired += 1
+            raise DeadlineExceeded("Deadline passed while waiting for an interpreter")
+        except BaseException:
+            self._abandon(future)
+            raise
+        self.admitted += 1
+        return time.monotonic()
+
+    def _abandon(self, future: asyncio.Future):
+        """Leave the queue; if a slot was handed over in the meantime, pass it on."""
+        if future.done() and not future.cancelled():
+            self.release()
+        else:
+            future.cancel()
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                pass
+
+    def release(self, granted_at: float = None):
+        """Give a slot back, handing it straight to the oldest waiter if there is one."""
+        if granted_at is not None:
+            held = time.monotonic() - granted_at
+            self._service_seconds = held if self._service_seconds is None else 0.9 * self._service_seconds + 0.1 * held
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "mean_service_ms": round(self._service_seconds * 1000, 2) if self._service_seconds else None,
+        }
@@ -0,0 +1,530 @@
+"""
+⏱️  Benchmarks — offline performance reports for the Digital Doctor backend
+==========================================================================
+Runs against the bundled model.tflite. When no image folder is given,
+synthetic leaf-like photos are generated so results are reproducible.
+
+Run with:
+    python benchmark.py preprocess                       # decode/resize modes vs the original path
+    python benchmark.py preprocess --images field_photos/ --json preprocess.json
+    python benchmark.py neardup                          # near-duplicate reuse on synthetic bursts
+    python benchmark.py neardup --images field_photos/   # photos in name order, treated as one stream
+    python benchmark.py threads --concurrency 4          # invoke p95 per interpreter thread count
+    python benchmark.py suite --json BENCH.json          # stage + end-to-end numbers for this commit
+    python benchmark.py suite --baseline BENCH.json      # …and fail if p95 regressed against a saved run
+    python benchmark.py serialize                        # stdlib JSON vs orjson on the response payloads
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+# Phone-camera-like sizes, from a thumbnail up to a 12 MP photo
+SYNTHETIC_SIZES = [(224, 224), (1024, 768), (2048, 1536), (4000, 3000)]
+SUITE_FORMATS = ("JPEG", "PNG", "WEBP")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+# ── Inputs ───────────────────────────────────────────────────
+
+def synthetic_image(size: tuple, fmt: str = "JPEG", seed: int = 0) -> bytes:
+    """A green, blotchy, slightly noisy image — closer to a leaf photo than a flat colour."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    arr = np.empty((h, w, 3), dtype=np.float32)
+    arr[..., 0] = 60 + 40 * np.sin(xx / (w / 7.0) + seed)
+    arr[..., 1] = 130 + 50 * np.cos(yy / (h / 5.0) - seed)
+    arr[..., 2] = 40 + 30 * np.sin((xx + yy) / (w / 3.0))
+    # Brown lesions at random positions
+    for cx, cy, r in zip(rng.uniform(0, w, 6), rng.uniform(0, h, 6), rng.uniform(0.02, 0.08, 6) * w):
+        mask = (xx - cx) ** 2 + (yy - cy) ** 2 < r ** 2
+        arr[mask] = (120, 80, 30)
+    arr += rng.normal(0, 8, arr.shape).astype(np.float32)
+    img = Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        img.save(buf, format=fmt, quality=90)
+    else:
+        img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+def load_images(folder: str = None, sizes: list = None, formats: tuple = ("JPEG",)) -> list:
+    """Return [(name, bytes)] from a folder, or synthetic images when no folder is given."""
+    if folder:
+        images = []
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(folder, name), "rb") as f:
+                    images.append((name, f.read()))
+        if not images:
+            raise SystemExit(f"No images found in {folder}")
+        return images
+
+    images = []
+    for i, size in enumerate(sizes or SYNTHETIC_SIZES):
+        for fmt in formats:
+            images.append((f"synthetic_{size[0]}x{size[1]}.{fmt.lower()}", synthetic_image(size, fmt, seed=i)))
+    return images
+
+
+# ── Stats helpers ────────────────────────────────────────────
+
+def summarize(samples: list) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def timed(fn, *args, repeats: int = 5) -> tuple:
+    """Call fn(*args) `repeats` times, returning (last result, list of durations)."""
+    durations = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where `resource` is unavailable (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def environment() -> dict:
+    """What a saved report was measured on, so runs from different commits can be compared."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def print_separator(title=""):
+    print("\n" + "="*55)
+    if title:
+        print(f"  {title}")
+        print("="*55)
+
+
+def write_json(path: str, report: dict):
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n  ✅ Report saved to: {path}")
+
+
+# ── preprocess: JPEG draft decoding and resampling filters ───
+
+def original_decode(model, image_bytes: bytes) -> Image.Image:
+    """The decode path /predict used before draft decoding: full decode + LANCZOS, no EXIF."""
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    return img.resize((model.img_width, model.img_height), Image.LANCZOS)
+
+
+def top1(model, img: Image.Image) -> int:
+    arr = np.asarray(img, dtype=model.input_dtype)
+    if model.input_dtype == np.float32:
+        arr = arr / 255.0
+    return int(np.argmax(model.infer(arr[np.newaxis])[0]))
+
+
+def bench_preprocess(args) -> dict:
+    from model import CropDiseaseModel, RESAMPLE_FILTERS
+
+    model = CropDiseaseModel(labels=[])
+    images = load_images(args.images)
+    print_separator("PREPROCESS: draft decoding × resampling filter")
+    print(f"  {len(images)} images, {args.repeats} runs each\n")
+
+    baseline_times = []
+    baseline_top1 = []
+    for _, data in images:
+        img, durations = timed(original_decode, model, data, repeats=args.repeats)
+        baseline_times.extend(durations)
+        baseline_top1.append(top1(model, img))
+    baseline = summarize(baseline_times)
+
+    modes = []
+    for draft in (False, True):
+        for name, resample in RESAMPLE_FILTERS.items():
+            model.jpeg_draft, model.resample = draft, resample
+            times, agree = [], 0
+            for (_, data), reference in zip(images, baseline_top1):
+                img, durations = timed(model.decode, data, repeats=args.repeats)
+                times.extend(durations)
+                agree += top1(model, img) == reference
+            stats = summarize(times)
+            stats.update({
+                "jpeg_draft": draft,
+                "resample": name,
+                "speedup": round(baseline["mean_ms"] / stats["mean_ms"], 2),
+                "top1_agreement": round(agree / len(images), 4),
+            })
+            modes.append(stats)
+
+    print(f"  {'mode':<22}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}{'top-1 agree':>13}")
+    print(f"  {'original (LANCZOS)':<22}{baseline['p50_ms']:>9.2f}{baseline['p95_ms']:>9.2f}{1.0:>9.2f}{1.0:>13.2%}")
+    for m in modes:
+        label = f"{'draft' if m['jpeg_draft'] else 'full'} + {m['resample']}"
+        print(f"  {label:<22}{m['p50_ms']:>9.2f}{m['p95_ms']:>9.2f}{m['speedup']:>9.2f}{m['top1_agreement']:>13.2%}")
+
+    return {"images": [name for name, _ in images], "original": baseline, "modes": modes}
+
+
+# ── neardup: perceptual-hash reuse of burst photos ──────────
+
+def burst_variants(image_bytes: bytes, count: int, seed: int) -> list:
+    """Re-shoots of one photo: a slight shift, exposure change and a fresh JPEG encode."""
+    rng = np.random.default_rng(seed)
+    base = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    w, h = base.size
+    shots = []
+    for _ in range(count):
+        dx, dy = (rng.uniform(0, 0.03, 2) * (w, h)).astype(int)
+        shot = base.crop((dx, dy, w - int(rng.uniform(0, 0.03) * w), h - int(rng.uniform(0, 0.03) * h)))
+        shot = ImageEnhance.Brightness(shot).enhance(rng.uniform(0.95, 1.05))
+        buf = io.BytesIO()
+        shot.save(buf, format="JPEG", quality=int(rng.integers(80, 95)))
+        shots.append(buf.getvalue())
+    return shots
+
+
+def bench_neardup(args) -> dict:
+    from cache import NearDuplicateIndex, image_fingerprint
+    from model import CropDiseaseModel
+
+    model = CropDiseaseModel(labels=[])
+    if args.images:
+        stream = [data for _, data in load_images(args.images)]
+    else:
+        # Distinct "leaves", each followed by a burst of re-shoots
+        stream = []
+        for seed in range(args.bursts):
+            base = synthetic_image((1024, 768), seed=seed)
+            stream.append(base)
+            stream.extend(burst_variants(base, args.burst_size - 1, seed))
+
+    print_separator("NEARDUP: perceptual-hash reuse")
+    print(f"  {len(stream)} photos in upload order\n")
+
+    fingerprints, scores = [], []
+    for data in stream:
+        img = model.decode(data)
+        fingerprints.append(image_fingerprint(img))
+        scores.append(model.infer_image(img))
+    truth = [int(np.argmax(s)) for s in scores]
+
+    thresholds = []
+    for max_distance in range(0, 11, 2):
+        index = NearDuplicateIndex(capacity=1024, max_distance=max_distance, ttl_seconds=3600)
+        hits, served = 0, []
+        for fp, s in zip(fingerprints, scores):
+            reused = index.lookup(fp)
+            if reused is None:
+                index.add(fp, s)
+                served.append(s)
+            else:
+                hits += 1
+                served.append(reused)
+        changed = sum(int(np.argmax(s)) != t for s, t in zip(served, truth))
+        agree = hits - changed
+        thresholds.append({
+            "max_distance": max_distance,
+            "hit_rate": round(hits / len(stream), 4),
+            "top1_agreement_on_hits": round(agree / hits, 4) if hits else None,
+            "top1_changed_overall": round(changed / len(stream), 4),
+            "max_abs_score_error": round(float(max(np.abs(a - b).max() for a, b in zip(served, scores))), 4),
+        })
+
+    print(f"  {'max dist':>9}{'hit rate':>10}{'agree on hits':>15}{'top-1 changed':>15}")
+    for t in thresholds:
+        agree = f"{t['top1_agreement_on_hits']:.2%}" if t["top1_agreement_on_hits"] is not None else "—"
+        print(f"  {t['max_distance']:>9}{t['hit_rate']:>10.2%}{agree:>15}{t['top1_changed_overall']:>15.2%}")
+
+    return {"photos": len(stream), "thresholds": thresholds}
+
+
+# ── threads: interpreter thread count at a given concurrency ─
+
+def bench_threads(args) -> dict:
+    from config import MODEL_PATH, XNNPACK_ENABLED
+    from model import autotune_threads
+
+    with open(MODEL_PATH, "rb") as f:
+        model_content = f.read()
+    candidates = [int(t) for t in args.candidates.split(",")] if args.candidates else None
+    best, results = autotune_threads(model_content, args.concurrency, candidates, runs=args.runs)
+
+    print_separator("THREADS: interpreter num_threads × concurrency")
+    print(f"  {args.concurrency} concurrent interpreters, {args.runs} invokes each, "
+          f"XNNPACK {'on' if XNNPACK_ENABLED else 'off'}\n")
+    print(f"  {'threads':>8}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}")
+    for threads, r in results.items():
+        marker = "  ← best p95" if threads == best else ""
+        print(f"  {threads:>8}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['throughput_per_s']:>9.1f}{marker}")
+    print(f"\n  👉 INTERPRETER_THREADS={best}")
+
+    return {"concurrency": args.concurrency, "xnnpack": XNNPACK_ENABLED, "best": best,
+            "results": {str(t): r for t, r in results.items()}}
+
+
+# ── suite: per-stage and end-to-end numbers for regression tracking ─
+
+def bench_stages(model, images: list, repeats: int) -> list:
+    """preprocess → invoke → postprocess timings for each image, on one interpreter."""
+    rows = []
+    for name, data in images:
+        batch, preprocess_times = timed(model.preprocess, data, repeats=repeats)
+        scores, invoke_times = timed(model.infer, batch, repeats=repeats)
+        _, postprocess_times = timed(model.postprocess, scores[0], repeats=repeats)
+        rows.append({
+            "image": name,
+            "bytes": len(data),
+            "preprocess": summarize(preprocess_times),
+            "invoke": summarize(invoke_times),
+            "postprocess": summarize(postprocess_times),
+        })
+    return rows
+
+
+async def bench_e2e(images: list, requests: int, concurrency: int) -> dict:
+    """POST /predict through an in-process ASGI client, `concurrency` requests at a time."""
+    import httpx
+    from config import MAX_UPLOAD_BYTES
+    from main import app
+    from model import get_model
+
+    model = get_model()
+    model.cache = None   # every request must run the full path, not hit the prediction cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(name: str, data: bytes) -> float:
+            start = time.perf_counter()
+            response = await client.post("/predict", files={"image": (name, data)})
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            return elapsed
+
+        await post(*images[0])   # warm-up
+        results = {}
+        for name, data in images:
+            if len(data) > MAX_UPLOAD_BYTES:
+                # /predict answers these with 413, which is not what we are timing
+                results[name] = {"skipped": f"larger than MAX_UPLOAD_BYTES ({len(data)} bytes)"}
+                continue
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one() -> float:
+                async with semaphore:
+                    return await post(name, data)
+
+            start = time.perf_counter()
+            durations = await asyncio.gather(*(one() for _ in range(requests)))
+            wall = time.perf_counter() - start
+            stats = summarize(durations)
+            stats["throughput_per_s"] = round(requests / wall, 2)
+            results[name] = stats
+    return {"concurrency": concurrency, "inference": model.stats(), "images": results}
+
+
+def compare_to_baseline(report: dict, baseline_path: str, tolerance: float) -> list:
+    """Return a line for every p95 that got slower than the baseline by more than `tolerance`."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+
+    base_stages = {row["image"]: row for row in baseline.get("stages", [])}
+    for row in report["stages"]:
+        base = base_stages.get(row["image"])
+        for stage in ("preprocess", "invoke", "postprocess"):
+            if base is not None:
+                regressions += _regression(f"{row['image']} {stage}", row[stage], base[stage], tolerance)
+
+    base_e2e = baseline.get("e2e", {}).get("images", {})
+    for name, stats in report.get("e2e", {}).get("images", {}).items():
+        if "p95_ms" in stats and "p95_ms" in base_e2e.get(name, {}):
+            regressions += _regression(f"{name} /predict", stats, base_e2e[name], tolerance)
+    return regressions
+
+
+def _regression(label: str, current: dict, base: dict, tolerance: float) -> list:
+    if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+        return [f"{label}: p95 {base['p95_ms']:.2f} → {current['p95_ms']:.2f} ms "
+                f"(+{current['p95_ms'] / base['p95_ms'] - 1:.0%})"]
+    return []
+
+
+def bench_suite(args) -> dict:
+    from model import CropDiseaseModel
+
+    images = load_images(args.images, formats=SUITE_FORMATS)
+    model = CropDiseaseModel()
+    print_separator("SUITE: preprocess / invoke / postprocess / end-to-end")
+    print(f"  {len(images)} images, {args.repeats} runs per stage, "
+          f"{args.requests} requests per image at concurrency {args.concurrency}\n")
+
+    stages = bench_stages(model, images, args.repeats)
+    e2e = asyncio.run(bench_e2e(images, args.requests, args.concurrency)) if not args.skip_e2e else {}
+
+    print(f"  {'image':<28}{'prep p95':>10}{'invoke p95':>12}{'post p95':>10}{'e2e p95':>10}{'req/s':>8}")
+    for row in stages:
+        end_to_end = e2e.get("images", {}).get(row["image"])
+        if end_to_end and "skipped" not in end_to_end:
+            e2e_cols = f"{end_to_end['p95_ms']:>10.2f}{end_to_end['throughput_per_s']:>8.1f}"
+        else:
+            e2e_cols = f"{'—' if end_to_end else '':>10}"
+        print(f"  {row['image']:<28}{row['preprocess']['p95_ms']:>10.2f}{row['invoke']['p95_ms']:>12.2f}"
+              f"{row['postprocess']['p95_ms']:>10.3f}{e2e_cols}")
+
+    report = {"environment": environment(), "stages": stages, "e2e": e2e, "peak_rss_mb": peak_rss_mb()}
+    print(f"\n  Peak RSS: {report['peak_rss_mb']} MB")
+
+    if args.baseline:
+        regressions = compare_to_baseline(report, args.baseline, args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            print(f"\n  ❌ {len(regressions)} p95 regression(s) over {args.tolerance:.0%} vs {args.baseline}:")
+            for line in regressions:
+                print(f"     {line}")
+        else:
+            print(f"\n  ✅ No p95 regressions over {args.tolerance:.0%} vs {args.baseline}")
+    return report
+
+
+# ── serialize: response encoding, stdlib json vs orjson ─────
+
+def response_payloads() -> dict:
+    """The bodies the API actually sends: a diagnosis, the disease list and every disease page."""
+    from disease_info import PLANTVILLAGE_LABELS, HEALTHY_LABELS, format_label, get_disease_info, get_action_plan
+    from model import CropDiseaseModel
+
+    model = CropDiseaseModel()
+    scores = np.full(len(model.labels), 0.02, dtype=np.float32)
+    scores[1] = 1.0 - scores[1:].sum()   # a confident diagnosis, with info and a 7-day plan
+    diagnosis = model.postprocess(scores)
+    diagnosis["inference_time_seconds"] = 0.045
+
+    diseases = [
+        {"id": i, "raw_label": label, "display_name": format_label(label), "is_healthy": label in HEALTHY_LABELS}
+        for i, label in enumerate(PLANTVILLAGE_LABELS)
+    ]
+    details = [
+        {"raw_label": label, "display_name": format_label(label),
+         "info": get_disease_info(label), "action_plan": get_action_plan(label)}
+        for label in PLANTVILLAGE_LABELS
+    ]
+    return {
+        "/predict": [diagnosis],
+        "/diseases": [{"total": len(diseases), "diseases": diseases}],
+        "/diseases/{label}": details,
+    }
+
+
+def bench_serialize(args) -> dict:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    encoders = {
+        # What FastAPI did for a returned dict before: jsonable_encoder, then stdlib json
+        "stdlib": lambda payload: JSONResponse(content=jsonable_encoder(payload)).body,
+        "orjson": lambda payload: ORJSONResponse(content=payload).body,
+    }
+    print_separator("SERIALIZE: response encoding")
+    print(f"  {args.repeats} runs per payload\n")
+    print(f"  {'payload':<20}{'bytes':>8}{'stdlib p50 µs':>15}{'orjson p50 µs':>15}{'speedup':>9}")
+
+    report = {}
+    for endpoint, payloads in response_payloads().items():
+        results = {}
+        for name, encode in encoders.items():
+            body, durations = None, []
+            for payload in payloads:
+                body, times = timed(encode, payload, repeats=args.repeats)
+                durations.extend(times)
+            results[name] = summarize(durations)
+        speedup = round(results["stdlib"]["p50_ms"] / results["orjson"]["p50_ms"], 2)
+        report[endpoint] = {"bytes": len(body), "speedup": speedup, **results}
+        print(f"  {endpoint:<20}{len(body):>8}{results['stdlib']['p50_ms'] * 1000:>15.1f}"
+              f"{results['orjson']['p50_ms'] * 1000:>15.1f}{speedup:>9.2f}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Digital Doctor performance reports")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("preprocess", help="Latency and top-1 agreement of decode/resize modes")
+    p.add_argument("--images", help="Folder of sample photos (default: synthetic images)")
+    p.add_argument("--repeats", type=int, default=5, help="Timed runs per image")
+    p.add_argument("--json", help="Write the report to this JSON file")
+
+    p = sub.add_parser("neardup", help="Hit rate and accuracy impact of near-duplicate reuse")
+    p.add_argument("--images", help="Folder of sample photos, in upload order (default: synthetic bursts)")
+    p.add_argument("--bursts", type=int, default=10, help="Synthetic leaves")
+    p.add_argument("--burst-size", type=int, default=4, help="Shots per synthetic leaf")
+    p.add_argument("--json", help="Write the report to this JSON file")
+
+    p = sub.add_parser("threads", help="Invoke latency per interpreter thread count, under concurrency")
+    p.add_argument("--concurrency", type=int, default=1, help="Interpreters invoking in parallel (pool size)")
+    p.add_argument("--candidates", help="Comma-separated thread counts (default: 1,2,4,…,cpu count)")
+    p.add_argument("--runs", type=int, default=30, help="Timed invokes per interpreter")
+    p.add_argument("--json", help="Write the report to this JSON file")
+
+    p = sub.add_parser("suite", help="Stage and end-to-end latency, throughput and peak RSS")
+    p.add_argument("--images", help="Folder of sample photos (default: synthetic JPEG/PNG/WebP, 224px to 4000px)")
+    p.add_argument("--repeats", type=int, default=10, help="Timed runs per stage and image")
+    p.add_argument("--requests", type=int, default=20, help="/predict requests per image")
+    p.add_argument("--concurrency", type=int, default=4, help="/predict requests in flight at once")
+    p.add_argument("--skip-e2e", action="store_true", help="Only time the model stages")
+    p.add_argument("--baseline", help="Earlier suite JSON to compare p95 latencies against")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed p95 slowdown vs the baseline")
+    p.add_argument("--json", help="Write the report to this JSON file")
+
+    p = sub.add_parser("serialize", help="Response serialization cost, stdlib json vs orjson")
+    p.add_argument("--repeats", type=int, default=200, help="Timed encodes per payload")
+    p.add_argument("--json", help="Write the report to this JSON file")
+
+    args = parser.parse_args()
+    commands = {
+        "preprocess": bench_preprocess,
+        "neardup": bench_neardup,
+        "threads": bench_threads,
+        "suite": bench_suite,
+        "serialize": bench_serialize,
+    }
+    report = commands[args.command](args)
+    write_json(args.json, report)
+    if report.get("regressions"):
+        sys.exit(1)
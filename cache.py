@@ -0,0 +1,206 @@
+"""
+🗃️  Prediction Cache — skip inference for photos we have already diagnosed
+==========================================================================
+Farmers on flaky connections resend the same photo, and the app retries on
+timeout. Results are cached by a hash of the image bytes plus the model
+fingerprint, and identical uploads that arrive while the first one is still
+running wait on that computation instead of starting another.
+
+The mobile app also sends bursts of nearly identical shots whose bytes
+differ. NearDuplicateIndex catches those after decode, by perceptual hash.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import orjson
+from PIL import Image
+
+
+class PredictionCache:
+    """
+    LRU cache with a TTL and entry/byte bounds, plus in-flight request coalescing.
+
+    Used only from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes   = max(1, max_bytes)
+        self.ttl         = ttl_seconds
+        self._entries  = OrderedDict()   # key → (expires_at, size, result)
+        self._inflight = {}              # key → asyncio.Task
+        self.bytes     = 0
+        self.hits      = 0
+        self.misses    = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(image_bytes: bytes, model_version: str) -> str:
+        return f"{model_version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    async def get_or_compute(self, key: str, compute) -> dict:
+        """
+        Return the cached result for `key`, or await compute() to produce it.
+
+        compute() runs as its own task, so a client that disconnects does not
+        cancel the work other coalesced requests are waiting on. Callers get a
+        shallow copy they are free to add fields to.
+        """
+        result = self._lookup(key)
+        if result is not None:
+            self.hits += 1
+            return dict(result)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return dict(await asyncio.shield(task))
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, size, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _finish(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Failures are not cached — the next upload of the same photo tries again
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._store(key, task.result())
+
+    def _store(self, key: str, result: dict):
+        size = len(orjson.dumps(result, default=str, option=orjson.OPT_SERIALIZE_NUMPY))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._entries[key] = (time.monotonic() + self.ttl, size, result)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+# ── Near-duplicate photos ────────────────────────────────────
+
+def image_fingerprint(img: Image.Image) -> tuple:
+    """
+    (64-bit dHash, mean RGB) of a decoded image, from one 9x8 thumbnail.
+
+    dHash alone only sees brightness gradients — flat or very blurry shots of
+    different colours all hash to 0 — so matches also have to agree on colour.
+    """
+    small = np.asarray(img.convert("RGB").resize((9, 8), Image.BILINEAR), dtype=np.float32)
+    gray = small @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big"), small.mean(axis=(0, 1))
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):   # NumPy 2.x
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+
+class NearDuplicateIndex:
+    """
+    Recent (fingerprint, scores) pairs in fixed-size ring buffers.
+
+    A lookup is one vectorised XOR + popcount over at most `capacity` uint64
+    hashes, so it costs microseconds next to invoke(). Lookups and inserts come
+    from executor threads and take a short lock.
+    """
+
+    def __init__(self, capacity: int, max_distance: int, ttl_seconds: float, max_color_delta: float = 12.0):
+        self.capacity        = max(1, capacity)
+        self.max_distance    = max_distance
+        self.max_color_delta = max_color_delta
+        self.ttl             = ttl_seconds
+        self._hashes  = np.zeros(self.capacity, dtype=np.uint64)
+        self._colors  = np.zeros((self.capacity, 3), dtype=np.float32)
+        self._expires = np.zeros(self.capacity, dtype=np.float64)
+        self._scores  = [None] * self.capacity
+        self._next    = 0
+        self._lock    = threading.Lock()
+        self.hits     = 0
+        self.misses   = 0
+
+    def lookup(self, fingerprint: tuple):
+        """Return the scores of the closest live entry within max_distance, or None."""
+        dup_hash, color = fingerprint
+        now = time.monotonic()
+        with self._lock:
+            distances = _popcount(self._hashes ^ np.uint64(dup_hash)).astype(np.int32)
+            color_delta = np.abs(self._colors - color).max(axis=1)
+            distances[(self._expires < now) | (color_delta > self.max_color_delta)] = 65
+            best = int(np.argmin(distances))
+            if distances[best] <= self.max_distance:
+                self.hits += 1
+                return self._scores[best]
+            self.misses += 1
+            return None
+
+    def add(self, fingerprint: tuple, scores: np.ndarray):
+        dup_hash, color = fingerprint
+        with self._lock:
+            i = self._next
+            self._hashes[i]  = dup_hash
+            self._colors[i]  = color
+            self._expires[i] = time.monotonic() + self.ttl
+            self._scores[i]  = scores
+            self._next = (i + 1) % self.capacity
+
+    def clear(self):
+        with self._lock:
+            self._expires[:] = 0
+            self._scores = [None] * self.capacity
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "capacity": self.capacity,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -6,17 +6,156 @@ import os
 # ── Model ────────────────────────────────────────────────────
 MODEL_PATH = os.getenv("MODEL_PATH", "model.tflite")
 
+# TFLite runtime: "auto" tries ai_edge_litert, then tflite_runtime, then full
+# tensorflow. Set one of those names to force it.
+TFLITE_RUNTIME = os.getenv("TFLITE_RUNTIME", "auto")
+
+# Threads per interpreter: empty → runtime default, a number, or "auto" to
+# benchmark candidates at startup and keep the one with the best p95 at the
+# configured concurrency. With several pooled interpreters on shared vCPUs,
+# keep MODEL_POOL_SIZE × INTERPRETER_THREADS at or below the core count.
+INTERPRETER_THREADS = os.getenv("INTERPRETER_THREADS", "")
+
+# XNNPACK is TFLite's optimised CPU delegate, on by default. Turning it off
+# falls back to the builtin kernels; XNNPACK_LATEST_FEATURES opts in to
+# newer, not-yet-default XNNPACK optimisations.
+XNNPACK_ENABLED         = os.getenv("XNNPACK_ENABLED", "1") == "1"
+XNNPACK_LATEST_FEATURES = os.getenv("XNNPACK_LATEST_FEATURES", "0") == "1"
+
 # Image size your model expects (auto-detected as 224x224)
 IMAGE_SIZE = (224, 224)
 
+# ── Preprocessing ────────────────────────────────────────────
+# Decode JPEGs at a reduced DCT scale (1/2, 1/4 or 1/8) that is still at or
+# above the model input size — phone photos never need a full-size decode
+JPEG_DRAFT = os.getenv("JPEG_DRAFT", "1") == "1"
+
+# Filter for the final resize: NEAREST, BILINEAR, BOX or LANCZOS
+RESAMPLE_FILTER = os.getenv("RESAMPLE_FILTER", "LANCZOS").upper()
+
+# ── Uploads ──────────────────────────────────────────────────
+# Largest /predict upload, enforced while the body streams in
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+
+# Largest image accepted, read from the file header before decoding.
+# 50 MP covers phone cameras; anything bigger is a decompression bomb.
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+
 # Minimum confidence to trust a prediction
 # Below this → returns "Unrecognized" instead of a wrong answer
 CONFIDENCE_THRESHOLD = 0.30
 
+# Test-time augmentation: when the top confidence of the plain prediction lands
+# in [TTA_BAND_LOW, TTA_BAND_HIGH) — just around the threshold — TTA_VIEWS
+# extra views (mirror, center crop, corner crops) go through one batched
+# invoke and the scores of all views are averaged. Costs roughly TTA_VIEWS
+# extra invokes' worth of CPU, but only on the ambiguous photos.
+TTA_ENABLED   = os.getenv("TTA_ENABLED", "0") == "1"
+TTA_VIEWS     = int(os.getenv("TTA_VIEWS", "4"))
+TTA_BAND_LOW  = float(os.getenv("TTA_BAND_LOW", "0.15"))
+TTA_BAND_HIGH = float(os.getenv("TTA_BAND_HIGH", "0.45"))
+
 # ── Labels ───────────────────────────────────────────────────
 # Pointing to our labels.txt
 CUSTOM_LABELS_PATH = "labels.txt"
 
+# ── Model registry ───────────────────────────────────────────
+# Versioned models live in MODEL_REGISTRY_DIR/<version>/ as one .tflite file
+# plus an optional labels.txt. MODEL_PATH + CUSTOM_LABELS_PATH is always
+# available as version "default". The active version is recorded in
+# MODEL_REGISTRY_DIR/ACTIVE; MODEL_VERSION overrides it at startup.
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+MODEL_VERSION      = os.getenv("MODEL_VERSION", "")
+# Blank inputs run through every interpreter, at every batch size it will
+# see, before a model version starts serving — the first invokes pay for
+# lazy kernel setup inside the runtime
+WARMUP_INVOKES = int(os.getenv("WARMUP_INVOKES", 3))
+# Seconds between checks of the ACTIVE file for a version to switch to (0 = off)
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv("MODEL_REGISTRY_POLL_SECONDS", 0))
+# Bearer token for the /admin endpoints; they are disabled while it is empty
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Other versions serve alongside the active one: asked for by name (?model=)
+# or picked by crop (?crop=), and loaded on first use. MODEL_PRELOAD lists
+# versions to load at startup instead. Past MODEL_MEMORY_BUDGET_MB (0 = no
+# limit) the least recently used of them are unloaded again.
+MODEL_PRELOAD          = [v.strip() for v in os.getenv("MODEL_PRELOAD", "").split(",") if v.strip()]
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", 0))
+
+# ── Inference ────────────────────────────────────────────────
+# Number of interpreter instances serving /predict — one per worker thread.
+# Each instance holds its own tensor arena, so memory grows with this value.
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", min(4, os.cpu_count() or 1)))
+
+# How /predict reaches the interpreters:
+#   "pool"  → every request runs its own batch-1 invoke() on an idle interpreter
+#   "batch" → concurrent requests are grouped into one [N, H, W, 3] invoke()
+#   "process" → worker processes each own an interpreter; inputs are passed
+#               through shared memory so one API process can use every core
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "pool")
+
+# Micro-batching ("batch" mode): a batch is dispatched when it reaches
+# BATCH_MAX_SIZE requests or BATCH_MAX_WAIT_MS after its first request arrived
+BATCH_MAX_SIZE    = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Worker processes ("process" mode) and how long to wait for one to answer
+INFERENCE_WORKERS        = int(os.getenv("INFERENCE_WORKERS", os.cpu_count() or 1))
+INFERENCE_WORKER_TIMEOUT = float(os.getenv("INFERENCE_WORKER_TIMEOUT", "30"))
+
+# Admission control: predictions running at once (0 = what the inference
+# mode can actually run in parallel) and how many more may wait for a turn.
+# Past that, /predict answers 503 with Retry-After straight away. In "batch"
+# mode it is capped at the number of reusable input rows.
+MAX_CONCURRENT_INFERENCES = int(os.getenv("MAX_CONCURRENT_INFERENCES", 0))
+MAX_QUEUED_INFERENCES     = int(os.getenv("MAX_QUEUED_INFERENCES", 32))
+
+# ── Batch diagnosis (/predict/batch) ─────────────────────────
+# Caps on one field-visit upload: number of photos and their total size
+# (for zip archives, the total uncompressed size)
+BATCH_UPLOAD_MAX_ITEMS = int(os.getenv("BATCH_UPLOAD_MAX_ITEMS", "50"))
+BATCH_UPLOAD_MAX_BYTES = int(os.getenv("BATCH_UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# ── Diagnosis jobs (/jobs) ───────────────────────────────────
+# Upload now, fetch the result later. Finished jobs are kept for
+# JOBS_TTL_SECONDS; at most JOBS_MAX_ENTRIES jobs are held in memory at once.
+JOBS_MAX_ENTRIES = int(os.getenv("JOBS_MAX_ENTRIES", "1000"))
+JOBS_TTL_SECONDS = float(os.getenv("JOBS_TTL_SECONDS", "900"))
+# Pending jobs hold their uploads in memory: past JOBS_MAX_PENDING of them
+# (0 = MAX_QUEUED_INFERENCES) or JOBS_MAX_PENDING_BYTES in total, POST /jobs
+# answers 503 with Retry-After. A job that finds the inference queue full for
+# JOBS_MAX_WAIT_SECONDS fails.
+JOBS_MAX_PENDING       = int(os.getenv("JOBS_MAX_PENDING", 0)) or MAX_QUEUED_INFERENCES
+JOBS_MAX_PENDING_BYTES = int(os.getenv("JOBS_MAX_PENDING_BYTES", str(64 * 1024 * 1024)))
+JOBS_MAX_WAIT_SECONDS  = float(os.getenv("JOBS_MAX_WAIT_SECONDS", "120"))
+
+# ── Prediction cache ─────────────────────────────────────────
+# Results keyed by image hash + model fingerprint, so resent photos skip inference
+PREDICTION_CACHE_ENABLED     = os.getenv("PREDICTION_CACHE_ENABLED", "1") == "1"
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "1024"))
+PREDICTION_CACHE_MAX_BYTES   = int(os.getenv("PREDICTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "600"))
+
+# Near-duplicate reuse: burst shots of the same leaf differ in bytes but not in
+# content. A 64-bit dHash of the decoded image within NEAR_DUPLICATE_MAX_DISTANCE
+# bits of a recent one reuses its scores and skips invoke(). Off by default —
+# run `python benchmark.py neardup` on your own photos before enabling it.
+NEAR_DUPLICATE_ENABLED      = os.getenv("NEAR_DUPLICATE_ENABLED", "0") == "1"
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "4"))
+NEAR_DUPLICATE_CAPACITY     = int(os.getenv("NEAR_DUPLICATE_CAPACITY", "1024"))
+NEAR_DUPLICATE_TTL_SECONDS  = float(os.getenv("NEAR_DUPLICATE_TTL_SECONDS", "60"))
+
+# ── HTTP caching ─────────────────────────────────────────────
+# How long clients may reuse /diseases responses before revalidating with
+# their ETag. The catalogue only changes with a deploy.
+DISEASES_CACHE_MAX_AGE = int(os.getenv("DISEASES_CACHE_MAX_AGE", 24 * 60 * 60))
+
+# ── Debugging ────────────────────────────────────────────────
+# Every /predict response carries a Server-Timing header. With this on, the
+# JSON also gets a "timings" object (stage → ms); a single request can ask
+# for it with ?debug=true instead.
+RESPONSE_TIMINGS = os.getenv("RESPONSE_TIMINGS", "0") == "1"
+
 # ── Server ───────────────────────────────────────────────────
 HOST = "0.0.0.0"
 PORT = 8000
\ No newline at end of file
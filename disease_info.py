@@ -441,6 +441,26 @@ DISEASE_DATABASE = {
     },
 }
 
+# ── Crops ─────────────────────────────────────────────────────
+def crop_of(raw_label: str):
+    """'Tomato___Early_blight' → 'Tomato'; None for labels without a crop prefix."""
+    crop, separator, _ = raw_label.partition("___")
+    return crop if separator else None
+
+def crop_key(name: str) -> str:
+    """Crop name reduced to lowercase letters for matching: 'Corn_(maize)' → 'cornmaize'."""
+    return "".join(c for c in name.lower() if c.isalpha())
+
+def crop_alias(name: str) -> str:
+    """Short name a crop can also be asked for by — its first word: 'Corn_(maize)' → 'corn'."""
+    word = ""
+    for c in name.lower():
+        if c.isalpha():
+            word += c
+        elif word:
+            break
+    return word
+
 # ── Healthy classes shortcut ──────────────────────────────────
 HEALTHY_LABELS = {l for l in PLANTVILLAGE_LABELS if "healthy" in l.lower()}
 
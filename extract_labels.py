@@ -1,23 +1,184 @@
 """
 Run this to extract everything from your .tflite model file.
-It will show you input/output shapes AND try to find class names.
+It will show you input/output shapes AND find the class names.
+
+Models from TFLite Model Maker / AutoML carry their labels inside the file:
+the metadata names a label file, which is packed into a zip appended to the
+model. When that is there, the labels are written straight to labels.txt.
+Otherwise the file is scanned for strings that look like class names.
 
 Run with:
     py extract_labels.py
+    py extract_labels.py --model other.tflite --output other_labels.txt
 """
-import numpy as np
-import json
+import argparse
+import mmap
+import os
+import re
+import struct
+import zipfile
+
+from config import CUSTOM_LABELS_PATH, MODEL_PATH
+
+# ── TFLite metadata ──────────────────────────────────────────
+# Just enough of a flatbuffer reader to follow Model.metadata["TFLITE_METADATA"]
+# to the ModelMetadata buffer, and from there to the output tensor's label file.
+# Field numbers are from TensorFlow's schema.fbs and metadata_schema.fbs.
+MODEL_BUFFERS, MODEL_METADATA = 4, 6
+BUFFER_DATA, BUFFER_OFFSET, BUFFER_SIZE = 0, 1, 2
+METADATA_NAME, METADATA_BUFFER = 0, 1
+MODEL_META_SUBGRAPHS, MODEL_META_FILES = 3, 6
+SUBGRAPH_OUTPUTS = 3
+TENSOR_FILES = 6
+FILE_NAME, FILE_TYPE = 0, 2
+TENSOR_AXIS_LABELS = 2
+
+
+def _u32(buf, pos: int) -> int:
+    return struct.unpack_from("<I", buf, pos)[0]
+
+
+def _root(buf, start: int = 0) -> int:
+    return start + _u32(buf, start)
+
+
+def _field(buf, table: int, index: int):
+    """Position of a table field, or None if it is absent."""
+    vtable = table - struct.unpack_from("<i", buf, table)[0]
+    slot = 4 + 2 * index
+    if slot >= struct.unpack_from("<H", buf, vtable)[0]:
+        return None
+    offset = struct.unpack_from("<H", buf, vtable + slot)[0]
+    return table + offset if offset else None
+
+
+def _tables(buf, table: int, index: int) -> list:
+    """The tables in a vector-of-tables field."""
+    pos = _field(buf, table, index)
+    if pos is None:
+        return []
+    vector = pos + _u32(buf, pos)
+    return [vector + 4 + 4 * i + _u32(buf, vector + 4 + 4 * i) for i in range(_u32(buf, vector))]
+
+
+def _bytes(buf, table: int, index: int) -> bytes:
+    """A string or [ubyte] field."""
+    pos = _field(buf, table, index)
+    if pos is None:
+        return b""
+    vector = pos + _u32(buf, pos)
+    return bytes(buf[vector + 4:vector + 4 + _u32(buf, vector)])
+
+
+def metadata_label_files(buf) -> list:
+    """
+    Names of the label files the model's metadata attaches to its outputs
+    (TENSOR_AXIS_LABELS), output tensors first. Empty if it has no metadata.
+    """
+    model = _root(buf)
+    buffers = _tables(buf, model, MODEL_BUFFERS)
+    meta = None
+    for entry in _tables(buf, model, MODEL_METADATA):
+        if _bytes(buf, entry, METADATA_NAME) == b"TFLITE_METADATA":
+            pos = _field(buf, entry, METADATA_BUFFER)
+            buffer = buffers[_u32(buf, pos)] if pos is not None else None
+            if buffer is None:
+                continue
+            meta = _bytes(buf, buffer, BUFFER_DATA)
+            if not meta:   # models over 2 GB keep buffers after the flatbuffer
+                offset, size = (_field(buf, buffer, BUFFER_OFFSET), _field(buf, buffer, BUFFER_SIZE))
+                if offset is not None and size is not None:
+                    start = struct.unpack_from("<Q", buf, offset)[0]
+                    meta = bytes(buf[start:start + struct.unpack_from("<Q", buf, size)[0]])
+    if not meta:
+        return []
+
+    root = _root(meta)
+    files = [f for sub in _tables(meta, root, MODEL_META_SUBGRAPHS)
+             for tensor in _tables(meta, sub, SUBGRAPH_OUTPUTS)
+             for f in _tables(meta, tensor, TENSOR_FILES)]
+    files += _tables(meta, root, MODEL_META_FILES)
+    names = []
+    for f in files:
+        kind = _field(meta, f, FILE_TYPE)
+        if kind is not None and meta[kind] == TENSOR_AXIS_LABELS:
+            name = _bytes(meta, f, FILE_NAME).decode("utf-8", "replace")
+            if name not in names:
+                names.append(name)
+    return names
 
-def extract_model_info(model_path="model.tflite"):
-    import warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        from tensorflow.lite.python.interpreter import Interpreter
-        interpreter = Interpreter(model_path=model_path)
+
+def packed_labels(model_path: str, buf, num_classes: int):
+    """
+    (file name, labels) from the zip packed into the model, or (None, None).
+
+    The metadata decides which file holds the labels; without metadata, a
+    lone text file with one line per class is taken.
+    """
+    if not zipfile.is_zipfile(model_path):
+        return None, None
+    with zipfile.ZipFile(model_path) as packed:
+        members = packed.namelist()
+        names = [n for n in metadata_label_files(buf) if n in members]
+        if not names:
+            texts = [n for n in members if n.endswith(".txt")]
+            names = texts if len(texts) == 1 else []
+        for name in names:
+            text = packed.read(name).decode("utf-8", "replace")
+            labels = [line.strip() for line in text.splitlines() if line.strip()]
+            if len(labels) == num_classes:
+                return name, labels
+    return None, None
+
+
+# ── Fallback: printable strings in the flatbuffer ────────────
+# Whole runs of 3-40 printable ASCII characters (not part of a longer run)
+# made only of letters, spaces and "_-(),", as class names are
+LABEL_RUN = re.compile(rb"(?<![\x20-\x7e])[A-Za-z_ \-(),]{3,40}(?![\x20-\x7e])")
+
+SKIP = {"serving_default", "StatefulPartitionedCall", "dense", "sequential",
+        "conv2d", "batch_normalization", "max_pooling", "flatten", "dropout",
+        "relu", "softmax", "sigmoid", "input", "output", "float", "uint",
+        "TFLITE", "TFL3", "min", "max", "scale", "zero_point"}
+SKIP_PATTERN = re.compile("|".join(re.escape(kw) for kw in SKIP), re.IGNORECASE)
+
+
+def label_candidates(buf) -> list:
+    """Distinct strings in the model file that could be class names, in file order."""
+    seen = {}
+    for match in LABEL_RUN.finditer(buf):
+        s = match.group().decode("ascii").strip()
+        if s and not s.startswith("_") and not SKIP_PATTERN.search(s):
+            seen.setdefault(s, None)
+    return list(seen)
+
+
+def write_labels(labels: list, output_path: str, force: bool = False) -> bool:
+    """Write one label per line; an existing file with other labels is kept unless `force`."""
+    if os.path.exists(output_path) and not force:
+        with open(output_path, "r", encoding="utf-8") as f:
+            existing = [line.strip() for line in f if line.strip()]
+        if existing == labels:
+            print(f"  {output_path} already has these labels.")
+            return True
+        if existing:
+            print(f"  {output_path} exists with different labels — not overwritten (use --force).")
+            return False
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(labels) + "\n")
+    print(f"  Wrote {len(labels)} labels to {output_path}")
+    return True
+
+
+def extract_model_info(model_path=MODEL_PATH, output_path=CUSTOM_LABELS_PATH, force=False):
+    from model import load_interpreter_class
+    Interpreter = load_interpreter_class()
+    interpreter = Interpreter(model_path=model_path)
 
     interpreter.allocate_tensors()
     input_details  = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
+    num_classes = int(output_details[0]['shape'][-1])
 
     print("\n" + "="*55)
     print("  MODEL DETAILS")
@@ -25,56 +186,34 @@ def extract_model_info(model_path="model.tflite"):
     print(f"  Input shape : {input_details[0]['shape']}")
     print(f"  Input dtype : {input_details[0]['dtype'].__name__}")
     print(f"  Output shape: {output_details[0]['shape']}")
-    print(f"  Num classes : {output_details[0]['shape'][-1]}")
+    print(f"  Num classes : {num_classes}")
 
-    # Try to read raw flatbuffer bytes to find label strings
-    print("\n" + "="*55)
-    print("  SEARCHING FOR CLASS NAMES IN MODEL FILE...")
-    print("="*55)
+    with open(model_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        print("\n" + "="*55)
+        print("  READING LABELS FROM MODEL METADATA...")
+        print("="*55)
+        try:
+            name, labels = packed_labels(model_path, buf, num_classes)
+        except (struct.error, IndexError, zipfile.BadZipFile) as e:
+            print(f"  Could not read the metadata ({e})")
+            name, labels = None, None
+
+        if labels:
+            print(f"\n  Found {len(labels)} labels in the packed file '{name}':\n")
+            for i, label in enumerate(labels):
+                print(f"  [{i:02d}] {label}")
+            print()
+            write_labels(labels, output_path, force)
+            print("="*55 + "\n")
+            return labels
 
-    with open(model_path, "rb") as f:
-        raw = f.read()
-
-    # Find printable ASCII strings of length 3-40 chars — likely class names
-    strings = []
-    current = ""
-    for byte in raw:
-        if 32 <= byte <= 126:
-            current += chr(byte)
-        else:
-            if 3 <= len(current) <= 40:
-                strings.append(current)
-            current = ""
-
-    # Filter to likely class/label candidates
-    skip = {"serving_default", "StatefulPartitionedCall", "dense", "sequential",
-            "conv2d", "batch_normalization", "max_pooling", "flatten", "dropout",
-            "relu", "softmax", "sigmoid", "input", "output", "float", "uint",
-            "TFLITE", "TFL3", "min", "max", "scale", "zero_point"}
-
-    candidates = []
-    for s in strings:
-        s_clean = s.strip()
-        # Skip obvious non-label strings
-        if any(kw.lower() in s_clean.lower() for kw in skip):
-            continue
-        if s_clean.startswith(("_", ".", "/", "\\")):
-            continue
-        if s_clean.isdigit():
-            continue
-        # Likely class names: letters, underscores, spaces, hyphens only
-        if all(c.isalpha() or c in "_ -()," for c in s_clean):
-            candidates.append(s_clean)
-
-    # Deduplicate while preserving order
-    seen = set()
-    unique = []
-    for c in candidates:
-        if c not in seen:
-            seen.add(c)
-            unique.append(c)
-
-    num_classes = output_details[0]['shape'][-1]
+        print("  No label file packed in the model.")
+
+        # Try to read raw flatbuffer bytes to find label strings
+        print("\n" + "="*55)
+        print("  SEARCHING FOR CLASS NAMES IN MODEL FILE...")
+        print("="*55)
+        unique = label_candidates(buf)
 
     print(f"\n  Found {len(unique)} candidate strings. Showing most likely class names:\n")
     for i, s in enumerate(unique[:60]):
@@ -83,8 +222,15 @@ def extract_model_info(model_path="model.tflite"):
     print("\n" + "="*55)
     print(f"  Your model has {num_classes} output classes.")
     print(f"  Look at the list above and identify {num_classes} class names.")
-    print(f"  Then paste them here and I will create labels.txt for you!")
+    print(f"  Then put them in {output_path}, one per line, in output order.")
     print("="*55 + "\n")
+    return None
+
 
 if __name__ == "__main__":
-    extract_model_info()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default=MODEL_PATH, help='Path to your .tflite model file')
+    parser.add_argument('--output', default=CUSTOM_LABELS_PATH, help='Where to write the labels')
+    parser.add_argument('--force', action='store_true', help='Overwrite an existing labels file that differs')
+    args = parser.parse_args()
+    extract_model_info(args.model, args.output, args.force)
@@ -0,0 +1,94 @@
+"""
+📦 HTTP Caching — prebuilt, precompressed responses for static data
+===================================================================
+The disease catalogue only changes between deploys, yet the app fetches it
+on every launch over slow mobile networks. Each response is serialized and
+compressed once, at startup:
+
+  • a strong ETag lets the app revalidate with If-None-Match and get an
+    empty 304 instead of the body,
+  • Cache-Control lets it skip the request entirely while the copy is fresh,
+  • gzip (and brotli, when the optional `brotli` package is installed)
+    variants are ready to send, so nothing is compressed per request.
+"""
+import gzip
+import hashlib
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:   # optional: gzip alone still does most of the work
+    brotli = None
+
+# Preferred first when a client accepts several
+ENCODINGS = ("br", "gzip")
+
+
+def _accepted_encodings(header: str) -> set:
+    """Codings named in an Accept-Encoding header, minus any refused with q=0."""
+    accepted, refused = set(), set()
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        (accepted if q > 0 else refused).add(coding.lower())
+    if "*" in accepted:
+        accepted.update(ENCODINGS)
+    return accepted - refused
+
+
+def _etag_matches(header: str, etags: set) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix is ignored."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") in etags for tag in header.split(","))
+
+
+class PrecomputedResponse:
+    """
+    One serialized JSON body with its ETag and compressed variants.
+
+    Each encoding gets its own ETag (as the bytes differ), and If-None-Match
+    accepts any of them — a client that cached the gzip copy can revalidate
+    against the identity one.
+    """
+
+    def __init__(self, content, max_age: int):
+        body = orjson.dumps(content)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = f"public, max-age={max_age}"
+        self.variants = {None: (f'"{digest}"', body)}
+
+        compressed = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            if len(data) < len(body):
+                self.variants[encoding] = (f'"{digest}-{encoding}"', data)
+        self.etags = {etag for etag, _ in self.variants.values()}
+
+    def respond(self, request: Request) -> Response:
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ENCODINGS if e in self.variants and e in accepted), None)
+        etag, body = self.variants[encoding]
+        headers["ETag"] = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, self.etags):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
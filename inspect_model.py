@@ -12,18 +12,22 @@ Run with:
 
 If you also have a labels file:
     python inspect_model.py --model your_model.tflite --labels labels.txt
+
+To see where the model spends its time and memory:
+    python inspect_model.py --model your_model.tflite --profile --json profile.json
 =============================================================
 """
 
 import argparse
+import re
+import shutil
+import subprocess
+import time
 import numpy as np
 
 def inspect_model(model_path: str, labels_path: str = None):
-    try:
-        import tflite_runtime.interpreter as tflite
-        Interpreter = tflite.Interpreter
-    except ImportError:
-        from tensorflow.lite.python.interpreter import Interpreter
+    from model import load_interpreter_class
+    Interpreter = load_interpreter_class()
 
     print("\n" + "="*55)
     print("  🌾 Digital Doctor — Model Inspector")
@@ -102,9 +106,322 @@ def inspect_model(model_path: str, labels_path: str = None):
     print("="*55 + "\n")
 
 
+# ── Profiling ─────────────────────────────────────────────────
+# Ops that multiply-accumulate over a weight tensor (inputs[1]); everything
+# else is costed at one operation per element it reads or writes
+MAC_OPS = {"CONV_2D", "DEPTHWISE_CONV_2D", "FULLY_CONNECTED"}
+
+
+def op_macs(op: dict, shapes: dict) -> int:
+    """Multiply-accumulates (or element operations) one op performs, from its tensor shapes."""
+    inputs = [t for t in op["inputs"].tolist() if t >= 0]
+    out_elements = sum(int(np.prod(shapes[t])) for t in op["outputs"].tolist())
+    if op["op_name"] in MAC_OPS and len(inputs) > 1:
+        weights = shapes[inputs[1]]
+        if op["op_name"] == "CONV_2D":              # [out_ch, kh, kw, in_ch]
+            return out_elements * int(np.prod(weights[1:]))
+        if op["op_name"] == "DEPTHWISE_CONV_2D":    # [1, kh, kw, out_ch]
+            return out_elements * int(weights[1] * weights[2])
+        return out_elements * int(weights[-1])      # FULLY_CONNECTED: [units, in]
+    in_elements = int(np.prod(shapes[inputs[0]])) if inputs else 0
+    return max(out_elements, in_elements)
+
+
+def mac_profile(interpreter) -> list:
+    """Per-op MACs and each op's share of the model's total — a cost model, not a timing."""
+    shapes = {t["index"]: tuple(int(d) for d in t["shape"]) for t in interpreter.get_tensor_details()}
+    # A delegate node stands in for ops that are still listed individually
+    ops = [op for op in interpreter._get_ops_details() if op["op_name"] != "DELEGATE"]
+    macs = [op_macs(op, shapes) for op in ops]
+    total = sum(macs) or 1
+    return [
+        {
+            "index": op["index"],
+            "op": op["op_name"],
+            "output_shape": [list(shapes[t]) for t in op["outputs"].tolist()],
+            "macs": m,
+            "mac_percent": round(100.0 * m / total, 2),
+        }
+        for op, m in zip(ops, macs)
+    ]
+
+
+def _tflite_schema():
+    """The generated TFLite flatbuffer schema (object API), or None."""
+    for name in ("ai_edge_litert.schema_py_generated", "tensorflow.lite.python.schema_py_generated"):
+        try:
+            return __import__(name, fromlist=["ModelT"])
+        except ImportError:
+            continue
+    return None
+
+
+def truncated_models(model_content: bytes):
+    """
+    Yield (op index, model bytes) for each prefix of the main subgraph: the
+    same model cut off after op k, with that op's outputs as the outputs.
+    """
+    import flatbuffers
+
+    schema = _tflite_schema()
+    model = schema.ModelT.InitFromPackedBuf(bytearray(model_content), 0)
+    model.signatureDefs = None   # they name the original outputs
+    subgraph = model.subgraphs[0]
+    ops = list(subgraph.operators)
+    for k, op in enumerate(ops):
+        subgraph.operators = ops[:k + 1]
+        subgraph.outputs = [t for t in op.outputs if t >= 0]
+        builder = flatbuffers.Builder(len(model_content) + 1024)
+        builder.Finish(model.Pack(builder), file_identifier=b"TFL3")
+        yield k, bytes(builder.Output())
+
+
+def truncated_model_profile(model_content: bytes, num_threads, runs: int, interpreter) -> list:
+    """
+    Measured per-op time: the fastest invoke of the model cut off after op k,
+    minus that of the model cut off after op k-1. Op 0 also carries the fixed
+    cost of an invoke; differences lost in timing noise are clamped to zero.
+    """
+    rows = {row["index"]: row for row in mac_profile(interpreter)}
+    profile, previous = [], 0.0
+    for k, content in truncated_models(model_content):
+        cumulative = min(invoke_latencies(content, num_threads, runs)) * 1000.0
+        row = rows.get(k) or {"index": k, "op": "?", "output_shape": [], "macs": 0, "mac_percent": 0.0}
+        profile.append({**row, "ms": max(0.0, cumulative - previous)})
+        previous = cumulative
+    total = sum(row["ms"] for row in profile) or 1.0
+    for row in profile:
+        row["percent"] = round(100.0 * row["ms"] / total, 2)
+        row["ms"] = round(row["ms"], 4)
+    return profile
+
+
+def benchmark_model_profile(binary: str, model_path: str, num_threads: int, runs: int, xnnpack: bool) -> list:
+    """
+    Measured per-op timings from TensorFlow's benchmark_model tool (--enable_op_profiling).
+
+    Parses the "Run Order" table it prints; raises RuntimeError if the tool
+    fails or its output has no such table.
+    """
+    command = [binary, f"--graph={model_path}", "--enable_op_profiling=true", f"--num_runs={runs}",
+               f"--num_threads={num_threads or -1}", f"--use_xnnpack={'true' if xnnpack else 'false'}"]
+    completed = subprocess.run(command, capture_output=True, text=True, timeout=600)
+    if completed.returncode != 0:
+        raise RuntimeError(f"benchmark_model exited with {completed.returncode}: {completed.stderr.strip()[-300:]}")
+
+    rows, in_table = [], False
+    for line in (completed.stdout + completed.stderr).splitlines():
+        if "Run Order" in line:
+            in_table, rows = True, []
+            continue
+        if not in_table or "[node type]" in line:
+            continue
+        fields = re.split(r"\t+", line.strip())
+        if len(fields) < 7 or line.startswith("="):
+            if rows:
+                break
+            continue
+        node_type, _first, avg_ms, percent, _cdf, mem_kb, _calls, *name = fields
+        rows.append({
+            "index": len(rows),
+            "op": node_type,
+            "name": name[0] if name else "",
+            "ms": float(avg_ms),
+            "percent": float(percent.rstrip("%")),
+            "mem_kb": float(mem_kb),
+        })
+    if not rows:
+        raise RuntimeError("no per-op table in benchmark_model output")
+    return rows
+
+
+def invoke_latencies(model_content: bytes, num_threads, runs: int) -> list:
+    """Durations (seconds) of `runs` bare invoke() calls on a fresh, warmed-up interpreter."""
+    from model import CropDiseaseModel
+
+    model = CropDiseaseModel(model_content=model_content, labels=[], num_threads=num_threads)
+    model.infer(np.zeros((1, model.img_height, model.img_width, 3), dtype=model.input_dtype))
+    for _ in range(3):   # the first invokes pay for lazy kernel setup
+        model.interpreter.invoke()
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.interpreter.invoke()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def tensor_quantization(interpreter) -> list:
+    """Every tensor's dtype, shape and quantization parameters (per-channel ones in full)."""
+    tensors = []
+    for t in interpreter.get_tensor_details():
+        q = t["quantization_parameters"]
+        tensors.append({
+            "index": t["index"],
+            "name": t["name"],
+            "dtype": np.dtype(t["dtype"]).name,
+            "shape": [int(d) for d in t["shape"]],
+            "scales": [float(v) for v in q["scales"]],
+            "zero_points": [int(v) for v in q["zero_points"]],
+            "quantized_dimension": int(q["quantized_dimension"]),
+        })
+    return tensors
+
+
+def _range(values: list, fmt: str) -> str:
+    if not values:
+        return "—"
+    if len(values) == 1 or min(values) == max(values):
+        return format(values[0], fmt)
+    return f"{format(min(values), fmt)}…{format(max(values), fmt)} ({len(values)} ch)"
+
+
+def profile_model(model_path: str, runs: int = 100, thread_counts: list = None, binary: str = None,
+                  op_runs: int = 20) -> dict:
+    """Per-op time, memory, quantization and latency-by-thread-count report for a .tflite model."""
+    import os
+    from benchmark import environment, peak_rss_mb, summarize
+    from config import XNNPACK_ENABLED
+    from model import CropDiseaseModel, estimate_arena_bytes, load_interpreter_class, rss_bytes
+
+    load_interpreter_class()
+    with open(model_path, "rb") as f:
+        model_content = f.read()
+
+    cpus = os.cpu_count() or 1
+    if not thread_counts:
+        thread_counts = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+
+    # ── Memory: one interpreter, built and invoked once
+    rss_before = rss_bytes()
+    model = CropDiseaseModel(model_content=model_content, labels=[], num_threads=thread_counts[0])
+    model.infer(np.zeros((1, model.img_height, model.img_width, 3), dtype=model.input_dtype))
+    rss_after = rss_bytes()
+    memory = {
+        "model_bytes": len(model_content),
+        "arena_estimate_bytes": estimate_arena_bytes(model.interpreter, fallback=len(model_content)),
+        "interpreter_rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    # ── Latency distribution per thread count
+    latency = {}
+    for threads in thread_counts:
+        samples = invoke_latencies(model_content, threads, runs)
+        latency[threads] = {**summarize(samples),
+                            "min_ms": round(min(samples) * 1000.0, 3), "max_ms": round(max(samples) * 1000.0, 3)}
+
+    # ── Per-op time: benchmark_model's op profiler when it is installed, else
+    # timed truncated sub-models; only MAC shares if neither can be done
+    binary = binary or shutil.which("benchmark_model")
+    ops, source = None, "mac_share"
+    if binary:
+        try:
+            ops, source = benchmark_model_profile(binary, model_path, thread_counts[0], runs, XNNPACK_ENABLED), "benchmark_model"
+        except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"   ⚠️  benchmark_model failed ({e}) — timing truncated sub-models instead")
+    if ops is None and _tflite_schema() is not None:
+        try:
+            ops = truncated_model_profile(model_content, thread_counts[0], op_runs, model.interpreter)
+            source = "truncated_models"
+        except (ImportError, ValueError, RuntimeError) as e:
+            print(f"   ⚠️  Could not time truncated sub-models ({e}) — reporting MAC shares only")
+    if ops is None:
+        ops = mac_profile(model.interpreter)
+
+    return {
+        "model": model_path,
+        "environment": environment(),
+        "xnnpack": XNNPACK_ENABLED,
+        "ops": {"source": source, "threads": thread_counts[0], "rows": ops},
+        "memory": memory,
+        "latency_by_threads": {str(t): r for t, r in latency.items()},
+        "tensors": tensor_quantization(model.interpreter),
+    }
+
+
+def print_profile(report: dict):
+    ops = report["ops"]
+    print("\n" + "="*55)
+    print("  ⏱️  PER-OP TIME")
+    print("="*55)
+    if ops["source"] == "benchmark_model":
+        print("   Measured by benchmark_model --enable_op_profiling.")
+    elif ops["source"] == "truncated_models":
+        print("   Measured: fastest invoke of the model cut off after each op, minus the")
+        print("   cut before it (op 0 includes the fixed cost of an invoke).")
+    else:
+        print("   No timings: each op's share of the model's MACs, a cost model only.")
+        print("   Install TensorFlow's benchmark_model (or pass --benchmark-model) for measured numbers.")
+    print(f"   {ops['threads']} thread(s), XNNPACK {'on' if report['xnnpack'] else 'off'}\n")
+    if ops["source"] == "benchmark_model":
+        print(f"   {'#':>3}  {'op':<24}{'ms':>9}{'%':>7}{'mem KB':>9}  name")
+        for row in ops["rows"]:
+            print(f"   {row['index']:>3}  {row['op']:<24}{row['ms']:>9.3f}{row['percent']:>7.1f}{row['mem_kb']:>9.1f}  {row['name']}")
+    elif ops["source"] == "truncated_models":
+        print(f"   {'#':>3}  {'op':<20}{'output':<20}{'MMACs':>9}{'ms':>9}{'%':>7}")
+        for row in ops["rows"]:
+            shape = "x".join(str(d) for d in row["output_shape"][0]) if row["output_shape"] else ""
+            print(f"   {row['index']:>3}  {row['op']:<20}{shape:<20}{row['macs'] / 1e6:>9.2f}{row['ms']:>9.3f}{row['percent']:>7.1f}")
+    else:
+        print(f"   {'#':>3}  {'op':<20}{'output':<20}{'MMACs':>9}{'MAC %':>7}")
+        for row in ops["rows"]:
+            shape = "x".join(str(d) for d in row["output_shape"][0]) if row["output_shape"] else ""
+            print(f"   {row['index']:>3}  {row['op']:<20}{shape:<20}{row['macs'] / 1e6:>9.2f}{row['mac_percent']:>7.1f}")
+
+    share = "mac_percent" if ops["source"] == "mac_share" else "percent"
+    by_type = {}
+    for row in ops["rows"]:
+        by_type[row["op"]] = by_type.get(row["op"], 0.0) + row[share]
+    print(f"\n   By op type ({'MAC share' if share == 'mac_percent' else 'time'}): "
+          + ", ".join(f"{op} {pct:.1f}%" for op, pct in sorted(by_type.items(), key=lambda kv: -kv[1])))
+
+    memory = report["memory"]
+    print("\n" + "="*55)
+    print("  💾 MEMORY")
+    print("="*55)
+    print(f"   Model file            : {memory['model_bytes'] / 1024:.0f} KB")
+    print(f"   Tensor arena (est.)   : {memory['arena_estimate_bytes'] / 1024:.0f} KB   (peak live activations)")
+    if memory["interpreter_rss_bytes"] is not None:
+        print(f"   One interpreter (RSS) : {memory['interpreter_rss_bytes'] / 1024:.0f} KB   (arena, kernels' scratch, repacked weights)")
+    if memory["peak_rss_mb"] is not None:
+        print(f"   Peak RSS (process)    : {memory['peak_rss_mb']:.1f} MB")
+
+    print("\n" + "="*55)
+    print("  📊 INVOKE LATENCY BY THREAD COUNT")
+    print("="*55)
+    print(f"   {'threads':>7}{'n':>6}{'min':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}   (ms)")
+    for threads, r in report["latency_by_threads"].items():
+        print(f"   {threads:>7}{r['n']:>6}{r['min_ms']:>9.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}")
+
+    print("\n" + "="*55)
+    print("  🔢 TENSOR QUANTIZATION")
+    print("="*55)
+    print(f"   {'#':>4}  {'dtype':<8}{'shape':<18}{'scale':<28}{'zero point':<20}name")
+    for t in report["tensors"]:
+        shape = "x".join(str(d) for d in t["shape"])
+        print(f"   {t['index']:>4}  {t['dtype']:<8}{shape:<18}{_range(t['scales'], '.3g'):<28}"
+              f"{_range(t['zero_points'], 'd'):<20}{t['name']}")
+    print()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--model', required=True, help='Path to your .tflite model file')
     parser.add_argument('--labels', required=False, help='Path to labels.txt (optional)')
+    parser.add_argument('--profile', action='store_true', help='Also profile per-op time, memory, quantization and latency')
+    parser.add_argument('--runs', type=int, default=100, help='Timed invokes per thread count (with --profile)')
+    parser.add_argument('--threads', help='Comma-separated thread counts to time (default: 1,2,4,…,cpu count)')
+    parser.add_argument('--op-runs', type=int, default=20, help='Timed invokes per truncated sub-model for per-op time (with --profile)')
+    parser.add_argument('--benchmark-model', help='Path to TensorFlow\'s benchmark_model tool for measured per-op times')
+    parser.add_argument('--json', help='Write the profile to this JSON file')
     args = parser.parse_args()
-    inspect_model(args.model, args.labels)
\ No newline at end of file
+    inspect_model(args.model, args.labels)
+    if args.profile:
+        thread_counts = [int(t) for t in args.threads.split(",")] if args.threads else None
+        report = profile_model(args.model, args.runs, thread_counts, args.benchmark_model, args.op_runs)
+        print_profile(report)
+        if args.json:
+            from benchmark import write_json
+            write_json(args.json, report)
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""
+📬 Diagnosis Jobs — upload now, collect the result later
+========================================================
+On a rural connection, holding one HTTP request open through upload,
+decode and inference fails too often. POST /jobs returns a job id as soon
+as the photo has arrived; the diagnosis runs on the model pool in the
+background, and the app picks the result up by polling GET /jobs/{id} or
+by listening on GET /jobs/{id}/events (server-sent events) — either of
+which it can simply reopen after the connection drops.
+
+Jobs live in memory only: finished ones are kept for a TTL, and the store
+holds a bounded number in total. A pending job pins its whole upload, so
+pending jobs are capped by count and by bytes, and a job that cannot get
+an interpreter within a bounded time fails instead of waiting forever.
+
+Used only from the event loop thread, so no locking is needed.
+"""
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+
+import orjson
+
+from admission import Overloaded
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    def __init__(self, job_id: str, size: int = 0):
+        self.id = job_id
+        self.size = size              # upload bytes held until the job finishes
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None       # time.monotonic(), for TTL eviction
+        self.result = None            # same schema as a /predict response
+        self.error = None
+        self.revision = 0             # bumped on every status change
+        self._changed = asyncio.Event()
+        self.task = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def _set(self, status: str, result: dict = None, error: str = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        if self.finished:
+            self.finished_at = time.monotonic()
+        self.revision += 1
+        # Wake everyone waiting on the old event; later waiters get a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait_for_change(self, revision: int, timeout: float = None) -> bool:
+        """Wait until the job moves past `revision`; False if `timeout` ran out first."""
+        if self.revision != revision:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.created_at)) + "Z",
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """
+    Jobs by id, oldest first. Finished jobs expire after `ttl_seconds`;
+    when the store is full the oldest finished job makes room.
+
+    New jobs are refused with Overloaded while `max_pending` jobs are still
+    pending or their uploads add up to `max_pending_bytes`. A job that keeps
+    finding the inference queue full fails after `max_wait_seconds`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_pending: int,
+                 max_pending_bytes: int, max_wait_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.max_pending = max(1, max_pending)
+        self.max_pending_bytes = max_pending_bytes
+        self.max_wait = max_wait_seconds
+        self._jobs = OrderedDict()   # id → Job
+        self.submitted = 0
+        self.rejected  = 0
+        self.evicted   = 0
+        self.gave_up   = 0
+
+    def pending(self) -> tuple:
+        """(jobs not yet finished, bytes of upload they hold)."""
+        jobs = [j for j in self._jobs.values() if not j.finished]
+        return len(jobs), sum(j.size for j in jobs)
+
+    def submit(self, work, size: int = 0) -> Job:
+        """Create a job for a `size`-byte upload and run `await work()` for it in the background."""
+        self._evict()
+        pending, pending_bytes = self.pending()
+        if (len(self._jobs) >= self.max_entries or pending >= self.max_pending
+                or pending_bytes + size > self.max_pending_bytes):
+            self.rejected += 1
+            raise Overloaded(5)
+        job = Job(secrets.token_urlsafe(12), size)
+        self._jobs[job.id] = job
+        self.submitted += 1
+        job.task = asyncio.get_running_loop().create_task(self._run(job, work))
+        return job
+
+    async def _run(self, job: Job, work):
+        give_up_at = time.monotonic() + self.max_wait
+        while True:
+            job._set(RUNNING)
+            try:
+                result = await work()
+            except Overloaded as e:
+                # Nobody is holding a connection open for this job, so a full
+                # inference queue means waiting for a turn — for a while
+                if time.monotonic() + e.retry_after > give_up_at:
+                    self.gave_up += 1
+                    job._set(FAILED, error=f"Server busy for over {self.max_wait:.0f} s — please try again later")
+                    return
+                job._set(QUEUED)
+                await asyncio.sleep(e.retry_after)
+                continue
+            except asyncio.CancelledError:
+                job._set(FAILED, error="Server shutting down")
+                raise
+            except Exception as e:
+                job._set(FAILED, error=f"Prediction failed: {e}")
+                return
+            job._set(DONE, result=result)
+            return
+
+    def get(self, job_id: str) -> Job:
+        """The job with this id, or None if it never existed or has expired."""
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.monotonic()
+        for job_id in [j.id for j in self._jobs.values() if j.finished and now - j.finished_at > self.ttl]:
+            del self._jobs[job_id]
+            self.evicted += 1
+        if len(self._jobs) >= self.max_entries:
+            oldest = next((j for j in self._jobs.values() if j.finished), None)
+            if oldest is not None:
+                del self._jobs[oldest.id]
+                self.evicted += 1
+
+    def counts(self) -> dict:
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def stats(self) -> dict:
+        pending, pending_bytes = self.pending()
+        return {
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "max_pending": self.max_pending,
+            "max_pending_mb": round(self.max_pending_bytes / (1024 * 1024), 1),
+            "max_wait_seconds": self.max_wait,
+            "jobs": self.counts(),
+            "pending_mb": round(pending_bytes / (1024 * 1024), 1),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+            "gave_up": self.gave_up,
+        }
+
+    def close(self):
+        for job in self._jobs.values():
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+
+
+# ── Server-sent events ───────────────────────────────────────
+
+def sse_event(job: Job) -> bytes:
+    """One SSE message: the event name is the job status, the data is the whole job."""
+    return (f"id: {job.revision}\nevent: {job.status}\ndata: ".encode()
+            + orjson.dumps(job.to_dict()) + b"\n\n")
+
+
+async def event_stream(job: Job, keepalive_seconds: float = 15.0):
+    """
+    Stream the job's current state, then every change, until it finishes.
+
+    A comment line goes out every `keepalive_seconds` so proxies and mobile
+    networks don't drop the idle connection while inference is queued.
+    """
+    yield b"retry: 3000\n\n"
+    revision = None
+    while True:
+        if job.revision != revision:
+            revision = job.revision
+            yield sse_event(job)
+            if job.finished:
+                return
+        if not await job.wait_for_change(revision, keepalive_seconds):
+            yield b": keep-alive\n\n"
@@ -2,19 +2,41 @@
 🌾 Digital Doctor for Farmers — FastAPI Backend
 ================================================
 Endpoints:
-  GET  /              → Health check
+  GET  /              → Liveness check
+  GET  /ready         → Readiness check (503 until the model is loaded and warm)
   GET  /model-info    → Model details (useful for debugging)
   POST /predict       → Main diagnosis endpoint
+  POST /predict/batch → Many photos (or one zip) → streamed NDJSON results
+  POST /jobs          → Upload a photo, get a job id back at once
+  GET  /jobs/{id}     → Poll a job for its result (/jobs/{id}/events streams it over SSE)
   GET  /diseases      → List all known diseases
   GET  /diseases/{id} → Get info for a specific disease
+  GET  /metrics       → Prometheus metrics
+  GET  /admin/models  → Model registry (Bearer ADMIN_TOKEN), plus activate/rollback
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+_import_start = time.perf_counter()
+
+from fastapi import Depends, FastAPI, File, Header, Query, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from typing import List, Optional
+import asyncio
+import hmac
+import io
 import logging
-import time
-from config import HOST, PORT
+import zipfile
+import orjson
+from config import (
+    HOST, PORT, BATCH_UPLOAD_MAX_ITEMS, BATCH_UPLOAD_MAX_BYTES, MAX_UPLOAD_BYTES, RESPONSE_TIMINGS,
+    DISEASES_CACHE_MAX_AGE, ADMIN_TOKEN, MODEL_REGISTRY_POLL_SECONDS, JOBS_MAX_ENTRIES, JOBS_TTL_SECONDS,
+    JOBS_MAX_PENDING, JOBS_MAX_PENDING_BYTES, JOBS_MAX_WAIT_SECONDS,
+)
+from http_cache import PrecomputedResponse
+from uploads import UploadLimitMiddleware, is_zip, read_image_upload, validate_image
+import metrics
+from metrics import server_timing, stage, start_request_timings
 
 # Configure logging
 logging.basicConfig(
@@ -27,6 +49,19 @@ app = FastAPI(
     title="Digital Doctor for Farmers",
     description="AI-powered crop disease diagnosis API",
     version="1.0.0",
+    # orjson is several times faster than the stdlib encoder and takes NumPy values natively
+    default_response_class=ORJSONResponse,
+)
+
+# Cap request bodies while they stream in (with headroom for multipart framing)
+MULTIPART_OVERHEAD = 64 * 1024
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/predict":       MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        "/predict/batch": BATCH_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+        "/jobs":          MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+    },
 )
 
 # Allow requests from the React Native app (any origin during development)
@@ -35,27 +70,96 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+class ArrivalTimeMiddleware:
+    """Record when each request arrived (time.monotonic()) in request.state, before its body is read."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["arrived_at"] = time.monotonic()
+        await self.app(scope, receive, send)
+
+
+# Added last so it runs first: the X-Deadline-Ms budget includes the upload
+app.add_middleware(ArrivalTimeMiddleware)
+
 # ── Load model on startup ─────────────────────────────────────
-from model import get_model
+# Importing the registry is cheap: the TFLite runtime is only imported when the first model loads
+from registry import ModelNotReady, get_registry
+from admission import DeadlineExceeded, Overloaded
+from model import CorruptImage
+from jobs import JobStore, event_stream
+
+IMPORT_SECONDS = time.perf_counter() - _import_start
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("🌱 Starting Digital Doctor API...")
+    _disease_responses()
+    # Load and warm in the background: liveness (GET /) answers at once, /ready once the model is warm
+    app.state.model_loader = asyncio.create_task(_load_model())
+    if MODEL_REGISTRY_POLL_SECONDS > 0:
+        app.state.registry_watcher = asyncio.create_task(get_registry().watch())
+
+
+async def _load_model():
     try:
-        model = get_model()
+        model = await get_registry().start()
         logger.info(f"✅ Model loaded successfully — {len(model.labels)} classes")
+        logger.info("⏱️  Startup: " + ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in _startup_timings(model).items()))
     except Exception as e:
         logger.error(f"❌ Failed to load model: {e}")
         logger.error("Make sure your .tflite file is in the backend folder and MODEL_PATH in config.py is correct")
 
 
+def _startup_timings(model) -> dict:
+    return {"imports": IMPORT_SECONDS, **model.load_timings}
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    job_store.close()
+    get_registry().close()
+
+
 # ── Endpoints ─────────────────────────────────────────────────
 
+@app.exception_handler(ModelNotReady)
+async def model_not_ready(request: Request, exc: ModelNotReady):
+    return ORJSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return ORJSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    return ORJSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(CorruptImage)
+async def corrupt_image(request: Request, exc: CorruptImage):
+    return ORJSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+def _deadline(request: Request, budget_ms) -> float:
+    """X-Deadline-Ms is the client's remaining time budget, counted from when the request arrived."""
+    if budget_ms is None:
+        return None
+    return getattr(request.state, "arrived_at", time.monotonic()) + budget_ms / 1000.0
+
+
 @app.get("/")
 async def health_check():
-    """Health check — use this to confirm server is running"""
+    """Liveness check — the process is up. Says nothing about the model: see /ready"""
     return {
         "status": "running",
         "service": "Digital Doctor for Farmers",
@@ -64,93 +168,471 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness():
+    """Readiness check — 200 only once a model is loaded and warmed up, 503 before (or if loading failed)"""
+    registry = get_registry()
+    pool = registry.active
+    if pool is not None and pool.warm:
+        return {"status": "ready", "model_version": pool.version}
+    if registry.loading is not None:
+        reason = f"loading model version {registry.loading}"
+    else:
+        reason = f"no model loaded: {registry.last_error or 'not started'}"
+    return ORJSONResponse(status_code=503, content={"status": "not_ready", "detail": reason},
+                          headers={"Retry-After": "5"})
+
+
+async def _route(model_name: Optional[str], crop: Optional[str]) -> tuple:
+    """(pool, crop key) for a request's ?model= and ?crop= — 404 when nothing serves them."""
+    try:
+        return await get_registry().route(model_name, crop)
+    except LookupError as e:   # KeyError included
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+
 @app.get("/model-info")
-async def model_info():
-    """Returns model details — run this after starting to verify everything loaded"""
+async def model_info(model_name: Optional[str] = Query(None, alias="model")):
+    """Returns model details — run this after starting to verify everything loaded. ?model= picks a version."""
+    model, _ = await _route(model_name, None)
     try:
-        model = get_model()
         return {
             "image_size": f"{model.img_height}x{model.img_width}",
             "num_classes": len(model.labels),
             "labels": model.labels,
             "input_dtype": str(model.input_dtype),
+            "inference": model.stats(),
+            "registry": get_registry().stats(),
+            "cache": model.cache.stats() if model.cache is not None else None,
+            "near_duplicates": model.near_duplicates.stats() if model.near_duplicates is not None else None,
+            "jobs": job_store.stats(),
+            "startup_ms": {step: round(seconds * 1000, 1) for step, seconds in _startup_timings(model).items()},
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def _timings_ms(timings: dict) -> dict:
+    return {name: round(ns / 1e6, 3) for name, ns in timings.items()}
+
+
+def _finish_result(result: dict, model, timings: dict, start_time: int, debug: bool = False) -> dict:
+    """Add the timing and version fields every prediction response carries, and count the prediction."""
+    queue_wait = timings.get("queue_wait", 0)
+    result["inference_time_seconds"] = round((time.perf_counter_ns() - start_time - queue_wait) / 1e9, 3)
+    result["queue_wait_seconds"] = round(queue_wait / 1e9, 3)
+    result["model_version"] = model.version
+    if debug or RESPONSE_TIMINGS:
+        result["timings"] = _timings_ms(timings)
+    metrics.PREDICTIONS.inc(result["raw_label"], result["status"])
+    return result
+
+
 @app.post("/predict")
-async def predict(image: UploadFile = File(...)):
+async def predict(request: Request, image: UploadFile = File(...), debug: bool = False,
+                  model_name: Optional[str] = Query(None, alias="model"), crop: Optional[str] = None,
+                  x_deadline_ms: Optional[int] = Header(None)):
     """
     Main diagnosis endpoint.
 
-    Accepts: multipart/form-data with field 'image' (jpg/png)
-    Returns: JSON with disease name, confidence, treatment, 7-day action plan
+    Accepts: multipart/form-data with field 'image' (jpg/png/webp), and an
+             optional X-Deadline-Ms header: give up on the request if it is
+             still waiting for the model after that many milliseconds (504).
+             ?model= picks a model version; ?crop= (e.g. tomato) routes to a
+             model that knows the crop and only considers its diseases.
+    Returns: JSON with disease name, confidence, treatment, 7-day action plan.
+             The Server-Timing header breaks the request down by stage;
+             ?debug=true also adds them to the JSON as 'timings' (ms).
+             503 with Retry-After when the inference queue is full.
     """
-    # Validate file type
-    if image.content_type not in ["image/jpeg", "image/jpg", "image/png", "image/webp"]:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type: {image.content_type}. Please upload a JPG or PNG image."
-        )
+    request_start = time.perf_counter_ns()
+    deadline = _deadline(request, x_deadline_ms)
+    timings = start_request_timings()
 
-    # Read image bytes
-    image_bytes = await image.read()
-
-    if len(image_bytes) == 0:
-        raise HTTPException(status_code=400, detail="Empty image file received.")
+    # Read with a size cap, then check magic bytes and header dimensions
+    with stage("upload_read"):
+        image_bytes = await read_image_upload(image)
+    metrics.UPLOAD_BYTES.observe(len(image_bytes), "/predict")
 
     logger.info(f"Received image: {image.filename}, size: {len(image_bytes)/1024:.1f} KB")
 
     # Run prediction
-    start_time = time.time()
+    model, crop_key = await _route(model_name, crop)
+    model.acquire_lease()
+    start_time = time.perf_counter_ns()
+    metrics.IN_FLIGHT.inc()
     try:
-        model = get_model()
-        result = model.predict(image_bytes)
-        elapsed = round(time.time() - start_time, 3)
+        result = _finish_result(await model.predict_async(image_bytes, deadline, crop_key),
+                                model, timings, start_time, debug)
 
-        logger.info(f"Prediction: {result['disease']} ({result['confidence']*100:.1f}%) in {elapsed}s")
+        logger.info(f"Prediction: {result['disease']} ({result['confidence']*100:.1f}%) "
+                    f"in {result['inference_time_seconds']}s")
 
-        result["inference_time_seconds"] = elapsed
-        return JSONResponse(content=result)
+        with stage("serialization"):
+            response = ORJSONResponse(content=result)
+        response.headers["Server-Timing"] = server_timing(timings, time.perf_counter_ns() - request_start)
+        response.headers["X-Model-Version"] = model.version
+        return response
 
+    except Overloaded:
+        metrics.PREDICTIONS.inc("", "overloaded")
+        raise
+    except DeadlineExceeded:
+        metrics.PREDICTIONS.inc("", "deadline_exceeded")
+        raise
+    except CorruptImage:
+        metrics.PREDICTIONS.inc("", "invalid_image")
+        raise
     except Exception as e:
         logger.error(f"Prediction error: {e}", exc_info=True)
+        metrics.PREDICTIONS.inc("", "error")
         raise HTTPException(
             status_code=500,
             detail=f"Prediction failed: {str(e)}"
         )
+    finally:
+        metrics.IN_FLIGHT.dec()
+        model.release_lease()
 
 
-@app.get("/diseases")
-async def list_diseases():
-    """List all diseases the model can detect"""
-    from disease_info import PLANTVILLAGE_LABELS, format_label, HEALTHY_LABELS
-    diseases = [
-        {
-            "id": i,
-            "raw_label": label,
-            "display_name": format_label(label),
-            "is_healthy": label in HEALTHY_LABELS,
-        }
-        for i, label in enumerate(PLANTVILLAGE_LABELS)
-    ]
-    return {"total": len(diseases), "diseases": diseases}
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=detail)
 
 
-@app.get("/diseases/{raw_label:path}")
-async def get_disease(raw_label: str):
-    """Get detailed info for a specific disease by raw label"""
+def _extract_members(archive: zipfile.ZipFile, members: list) -> list:
+    """
+    [(filename, bytes or error message)] for zip members, inflated and validated.
+
+    A member that cannot be extracted (bad CRC, unsupported compression,
+    encryption) becomes an error item; the rest of the archive still counts.
+    Inflating is CPU work — run this in a thread, not on the event loop.
+    """
+    items = []
+    for m in members:
+        try:
+            member = archive.read(m)
+            error = validate_image(member)
+        except NotImplementedError:
+            items.append((m.filename, "Unsupported compression method in the archive."))
+            continue
+        except RuntimeError:   # zipfile's error for encrypted members
+            items.append((m.filename, "Password-protected file — please zip the photos without a password."))
+            continue
+        except Exception as e:   # bad CRC, truncated or corrupt data
+            logger.warning(f"Could not extract {m.filename}: {e}")
+            items.append((m.filename, f"Corrupt file in the archive: {e}"))
+            continue
+        items.append((m.filename, member if error is None else error))
+    return items
+
+
+async def _collect_batch_items(image: List[UploadFile]) -> list:
+    """Flatten the uploaded parts (and any zip archives) into [(filename, bytes or error message)]."""
+    items = []
+    total = 0
+
+    def check_caps():
+        if len(items) > BATCH_UPLOAD_MAX_ITEMS:
+            raise _too_large(f"Too many images: at most {BATCH_UPLOAD_MAX_ITEMS} per batch.")
+        if total > BATCH_UPLOAD_MAX_BYTES:
+            raise _too_large(f"Batch too large: at most {BATCH_UPLOAD_MAX_BYTES // (1024 * 1024)} MB per batch.")
+
+    for part in image:
+        data = await part.read()
+        if not is_zip(data[:4]):
+            total += len(data)
+            error = validate_image(data)
+            items.append((part.filename, data if error is None else error))
+            check_caps()
+            continue
+
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"Not a valid zip archive: {part.filename}")
+        members = [
+            m for m in archive.infolist()
+            if not m.is_dir() and not m.filename.startswith("__MACOSX/")
+            and m.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        # Check the declared sizes before extracting anything — zipfile never
+        # inflates a member past its declared size, so zip bombs stop here
+        total += sum(m.file_size for m in members)
+        start = len(items)
+        items.extend((m.filename, None) for m in members)
+        check_caps()
+        items[start:] = await asyncio.to_thread(_extract_members, archive, members)
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in the upload.")
+    return items
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request, image: List[UploadFile] = File(...), debug: bool = False,
+                        model_name: Optional[str] = Query(None, alias="model"), crop: Optional[str] = None,
+                        x_deadline_ms: Optional[int] = Header(None)):
+    """
+    Batch diagnosis for field visits.
+
+    Accepts: multipart/form-data with one or more 'image' parts, or a single zip archive
+    Returns: NDJSON — one line per image as soon as it finishes, in completion order.
+             Each line is the /predict response plus 'index' and 'filename';
+             failed images get status "error" and a 'detail' message instead.
+             ?debug=true adds per-image 'timings' (ms). X-Deadline-Ms, ?model= and ?crop=
+             apply to every image.
+    """
+    deadline = _deadline(request, x_deadline_ms)
+    with stage("upload_read"):
+        items = await _collect_batch_items(image)
+    for _, data in items:
+        if isinstance(data, bytes):
+            metrics.UPLOAD_BYTES.observe(len(data), "/predict/batch")
+    logger.info(f"Received batch of {len(items)} images")
+    model, crop_key = await _route(model_name, crop)
+    # Items wait their turn below, so the whole batch holds the pool, not each prediction
+    model.acquire_lease()
+    # One batch should not fill the whole admission queue by itself: its images
+    # take turns, at most as many at once as the model can run in parallel
+    turns = asyncio.Semaphore(model.admission.max_concurrent)
+
+    async def run(index: int, filename: str, data) -> dict:
+        if isinstance(data, str):
+            return {"index": index, "filename": filename, "status": "error", "detail": data}
+        # Each item runs in its own task, so its timings stay separate from the others'
+        timings = start_request_timings()
+        start_time = time.perf_counter_ns()
+        metrics.IN_FLIGHT.inc()
+        try:
+            async with turns:
+                result = await model.predict_async(data, deadline, crop_key)
+        except (Overloaded, DeadlineExceeded) as e:
+            metrics.PREDICTIONS.inc("", "overloaded" if isinstance(e, Overloaded) else "deadline_exceeded")
+            return {"index": index, "filename": filename, "status": "error", "detail": str(e)}
+        except CorruptImage as e:
+            metrics.PREDICTIONS.inc("", "invalid_image")
+            return {"index": index, "filename": filename, "status": "error", "detail": str(e)}
+        except Exception as e:
+            logger.warning(f"Batch item {index} ({filename}) failed: {e}")
+            metrics.PREDICTIONS.inc("", "error")
+            return {"index": index, "filename": filename, "status": "error", "detail": f"Prediction failed: {e}"}
+        finally:
+            metrics.IN_FLIGHT.dec()
+        _finish_result(result, model, timings, start_time, debug)
+        result["index"] = index
+        result["filename"] = filename
+        return result
+
+    async def stream():
+        tasks = [asyncio.ensure_future(run(i, name, data)) for i, (name, data) in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                with stage("serialization"):
+                    line = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+                yield line
+        finally:
+            # Client went away — drop the work that has not started yet
+            for task in tasks:
+                task.cancel()
+            asyncio.gather(*tasks, return_exceptions=True).add_done_callback(lambda _: model.release_lease())
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# ── Diagnosis jobs ────────────────────────────────────────────
+# For slow, flaky connections: the request ends once the photo has arrived,
+# and the result is fetched separately
+
+job_store = JobStore(JOBS_MAX_ENTRIES, JOBS_TTL_SECONDS, JOBS_MAX_PENDING, JOBS_MAX_PENDING_BYTES,
+                     JOBS_MAX_WAIT_SECONDS)
+metrics.REGISTRY.gauge(
+    "digital_doctor_jobs",
+    "Diagnosis jobs held in memory, by status.",
+    ("status",),
+    callback=lambda: {(status,): n for status, n in job_store.counts().items()},
+)
+
+
+async def _run_job(image_bytes: bytes, model_name: Optional[str], crop: Optional[str]) -> dict:
+    """Diagnose one job's photo; the result has the same fields as a /predict response."""
+    timings = start_request_timings()
+    model, crop_key = await get_registry().route(model_name, crop)
+    model.acquire_lease()
+    start_time = time.perf_counter_ns()
+    metrics.IN_FLIGHT.inc()
+    try:
+        result = await model.predict_async(image_bytes, None, crop_key)
+    except Overloaded:
+        metrics.PREDICTIONS.inc("", "overloaded")
+        raise
+    except CorruptImage:
+        metrics.PREDICTIONS.inc("", "invalid_image")
+        raise
+    except Exception as e:
+        logger.error(f"Job prediction error: {e}", exc_info=True)
+        metrics.PREDICTIONS.inc("", "error")
+        raise
+    finally:
+        metrics.IN_FLIGHT.dec()
+        model.release_lease()
+    return _finish_result(result, model, timings, start_time)
+
+
+def _get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id!r} — it never existed or has expired")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(image: UploadFile = File(...), model_name: Optional[str] = Query(None, alias="model"),
+                     crop: Optional[str] = None):
+    """
+    Start a diagnosis without waiting for it.
+
+    Accepts: multipart/form-data with field 'image', and ?model= / ?crop=, like /predict
+    Returns: 202 with the job id as soon as the upload is read; the result
+             comes from GET /jobs/{id} or GET /jobs/{id}/events.
+    """
+    with stage("upload_read"):
+        image_bytes = await read_image_upload(image)
+    metrics.UPLOAD_BYTES.observe(len(image_bytes), "/jobs")
+    # 503 or 404 now rather than a failed job while the model is still loading or unknown
+    await _route(model_name, crop)
+
+    job = job_store.submit(lambda: _run_job(image_bytes, model_name, crop), len(image_bytes))
+    logger.info(f"Job {job.id}: {image.filename}, size: {len(image_bytes)/1024:.1f} KB")
+    return ORJSONResponse(
+        status_code=202,
+        content={**job.to_dict(), "poll": f"/jobs/{job.id}", "events": f"/jobs/{job.id}/events"},
+        headers={"Location": f"/jobs/{job.id}"},
+    )
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status; once 'done', 'result' holds the same JSON /predict returns"""
+    return _get_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: the job's state now and on every change, ending with 'done' or 'failed'"""
+    job = _get_job(job_id)
+    return StreamingResponse(
+        event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latencies, predictions, upload sizes, queues and caches"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# The catalogue is static between deploys: every response is built, serialized
+# and compressed once, then served with an ETag and Cache-Control
+_disease_cache = None
+
+
+def _disease_detail(raw_label: str) -> dict:
     from disease_info import get_disease_info, get_action_plan, format_label
-    info = get_disease_info(raw_label)
     return {
         "raw_label": raw_label,
         "display_name": format_label(raw_label),
-        "info": info,
+        "info": get_disease_info(raw_label),
         "action_plan": get_action_plan(raw_label),
     }
 
 
+def _disease_responses() -> dict:
+    """{"list": PrecomputedResponse, "details": {raw_label: PrecomputedResponse}}, built on first use."""
+    global _disease_cache
+    if _disease_cache is None:
+        from disease_info import PLANTVILLAGE_LABELS, DISEASE_DATABASE, format_label, HEALTHY_LABELS
+        diseases = [
+            {
+                "id": i,
+                "raw_label": label,
+                "display_name": format_label(label),
+                "is_healthy": label in HEALTHY_LABELS,
+            }
+            for i, label in enumerate(PLANTVILLAGE_LABELS)
+        ]
+        _disease_cache = {
+            "list": PrecomputedResponse({"total": len(diseases), "diseases": diseases}, DISEASES_CACHE_MAX_AGE),
+            "details": {
+                label: PrecomputedResponse(_disease_detail(label), DISEASES_CACHE_MAX_AGE)
+                for label in dict.fromkeys([*PLANTVILLAGE_LABELS, *DISEASE_DATABASE])
+            },
+        }
+    return _disease_cache
+
+
+@app.get("/diseases")
+async def list_diseases(request: Request):
+    """List all diseases the model can detect"""
+    return _disease_responses()["list"].respond(request)
+
+
+@app.get("/diseases/{raw_label:path}")
+async def get_disease(raw_label: str, request: Request):
+    """Get detailed info for a specific disease by raw label"""
+    response = _disease_responses()["details"].get(raw_label)
+    if response is None:
+        # Unknown labels get the generic advice; built per request so the table stays bounded
+        response = PrecomputedResponse(_disease_detail(raw_label), DISEASES_CACHE_MAX_AGE)
+    return response.respond(request)
+
+
+# ── Admin: model registry ────────────────────────────────────
+
+def _require_admin(authorization: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+@app.get("/admin/models", dependencies=[Depends(_require_admin)])
+async def list_models():
+    """Registry state: active, previous (rollback target), loading, available versions"""
+    return get_registry().stats()
+
+
+@app.post("/admin/models/{version}/activate", status_code=202, dependencies=[Depends(_require_admin)])
+async def activate_model(version: str):
+    """Load and warm a version in the background, then swap it in. Poll GET /admin/models for progress."""
+    registry = get_registry()
+    if version not in registry.versions():
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    try:
+        task = registry.start_activation(version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    # Failures are logged and reported as last_error by GET /admin/models
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return {"status": "loading", "version": version}
+
+
+@app.post("/admin/models/rollback", dependencies=[Depends(_require_admin)])
+async def rollback_model():
+    """Swap back to the previous version instantly"""
+    try:
+        pool = get_registry().rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "active", "version": pool.version}
+
+
 # ── Run server ────────────────────────────────────────────────
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,332 @@
+"""
+📈 Metrics — Prometheus exposition for the inference pipeline
+=============================================================
+Served at GET /metrics in the Prometheus text format, without the
+prometheus_client dependency.
+
+Observations happen on the hot path from the event loop, executor threads
+and the batch dispatcher, so nothing here takes a lock per observation:
+every thread accumulates into its own shard, and a scrape sums the shards.
+A scrape may miss an observation that is being written at that instant;
+it shows up in the next one. Shards of threads that have exited (executors
+of retired model pools) are folded into one base total at the next scrape.
+
+Values that already live elsewhere (queue depths, cache statistics) are
+read through callbacks at scrape time instead of being mirrored here.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds — from a cache hit's postprocess up to a 4000px PNG decode
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes — thumbnails up to the 15 MB upload cap
+SIZE_BUCKETS = tuple(16 * 1024 * 4 ** i for i in range(6))   # 16 KB … 16 MB
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Base for metrics whose state is split into one shard per thread."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []                      # (owning thread, shard)
+        self._base = {}                        # totals of shards whose thread has exited
+        self._shards_lock = threading.Lock()   # taken once per thread, when its shard is created
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _merge(self, totals: dict, items):
+        """Add one shard's (labelvalues, state) items into `totals`."""
+        raise NotImplementedError
+
+    def _snapshot(self) -> list:
+        with self._shards_lock:
+            # A thread that has exited never writes its shard again, so it can be folded away
+            for thread, shard in [entry for entry in self._shards if not entry[0].is_alive()]:
+                self._merge(self._base, shard.items())
+                self._shards.remove((thread, shard))
+            base = list(self._base.items())
+            shards = [shard for _, shard in self._shards]
+        # list(dict.items()) is a single C call, so it is safe against concurrent inserts
+        return [base] + [list(shard.items()) for shard in shards]
+
+    def collect(self) -> dict:
+        totals = {}
+        for items in self._snapshot():
+            self._merge(totals, items)
+        return totals
+
+
+class Counter(_Sharded):
+    """
+    A monotonically increasing count, optionally split by labels.
+
+    With a callback, the totals are read from it at scrape time instead — for
+    counts another component already keeps. It returns a number or a
+    {labelvalues tuple: number} dict.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def _merge(self, totals: dict, items):
+        for labelvalues, value in items:
+            totals[labelvalues] = totals.get(labelvalues, 0) + value
+
+    def collect(self) -> dict:
+        if self.callback is not None:
+            value = self.callback()
+            return value if isinstance(value, dict) else ({} if value is None else {(): value})
+        return super().collect()
+
+    def render(self) -> list:
+        return [f"{self.name}_total{_labels(self.labelnames, lv)} {_number(v)}"
+                for lv, v in sorted(self.collect().items())]
+
+
+class Histogram(_Sharded):
+    """Bucketed observations, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # Per-bucket (not cumulative) counts plus +Inf, then the running sum
+            state = shard[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def _merge(self, totals: dict, items):
+        for labelvalues, (counts, total) in items:
+            merged = totals.setdefault(labelvalues, [[0] * (len(self.buckets) + 1), 0.0])
+            for i, count in enumerate(counts):
+                merged[0][i] += count
+            merged[1] += total
+
+    def render(self) -> list:
+        lines = []
+        for labelvalues, (counts, total) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    A value that goes up and down.
+
+    Either set directly (only ever from one thread — the event loop) or read
+    from a callback at scrape time. A callback may return a number or a
+    {labelvalues tuple: number} dict.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def render(self) -> list:
+        value = self.callback() if self.callback is not None else self.value
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.labelnames, lv)} {_number(v)}" for lv, v in sorted(value.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.render()
+            except Exception as e:   # a broken callback must not take the whole scrape down
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ── Pipeline metrics ─────────────────────────────────────────
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "digital_doctor_stage_seconds",
+    "Time spent in each stage of a prediction.",
+    ("stage",),
+)
+UPLOAD_BYTES = REGISTRY.histogram(
+    "digital_doctor_upload_bytes",
+    "Size of accepted image uploads.",
+    ("endpoint",),
+    buckets=SIZE_BUCKETS,
+)
+PREDICTIONS = REGISTRY.counter(
+    "digital_doctor_predictions",
+    "Predictions served, by predicted raw_label and response status.",
+    ("raw_label", "status"),
+)
+TTA_RUNS = REGISTRY.counter(
+    "digital_doctor_tta_runs",
+    "Ambiguous predictions re-run with test-time augmentation, by whether the averaged"
+    " confidence crossed the threshold (recovered, dropped) or not (unchanged).",
+    ("outcome",),
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "digital_doctor_in_flight_requests",
+    "Prediction requests currently being handled.",
+)
+
+
+# ── Per-request stage timings ────────────────────────────────
+# The request's {stage: nanoseconds} dict travels in a context variable:
+# tasks inherit it, and ModelPool hands it to executor threads explicitly.
+
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# False while warmup and thread-count benchmarks invoke on blank input
+_observe_stages = contextvars.ContextVar("observe_stages", default=True)
+
+
+def start_request_timings() -> dict:
+    """Collect the stages run from this point on in the current context into a new dict."""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def detach_request_timings():
+    """Stop recording into the current request — for long-lived tasks that serve many requests."""
+    _request_timings.set(None)
+
+
+@contextlib.contextmanager
+def unobserved_stages():
+    """Keep stages run in this context out of STAGE_SECONDS (threads must enter it themselves)."""
+    token = _observe_stages.set(False)
+    try:
+        yield
+    finally:
+        _observe_stages.reset(token)
+
+
+def server_timing(timings: dict, total_ns: int = None) -> str:
+    """Format stage timings as a Server-Timing header value (durations in milliseconds)."""
+    entries = [f"{name};dur={ns / 1e6:.3f}" for name, ns in timings.items()]
+    if total_ns is not None:
+        entries.append(f"total;dur={total_ns / 1e6:.3f}")
+    return ", ".join(entries)
+
+
+class stage:
+    """
+    Context manager timing one pipeline stage into STAGE_SECONDS, and into
+    the current request's timings when there is one:
+
+        with stage("decode"):
+            ...
+
+    With observe=False only the request's timings are updated — for
+    per-request views of work the histogram already counts elsewhere.
+    """
+
+    __slots__ = ("name", "observe", "start")
+
+    def __init__(self, name: str, observe: bool = True):
+        self.name = name
+        self.observe = observe
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter_ns() - self.start
+        if self.observe and _observe_stages.get():
+            STAGE_SECONDS.observe(elapsed / 1e9, self.name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0) + elapsed
+        return False
+
+
+def render() -> str:
+    return REGISTRY.render()
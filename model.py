@@ -2,33 +2,270 @@
 🧠 ML Model — TFLite Loader & Predictor
 """
 import numpy as np
-from PIL import Image
+from PIL import Image, ImageOps
+import asyncio
+import contextvars
+import hashlib
+import importlib
 import io
 import logging
-from config import MODEL_PATH, IMAGE_SIZE, CONFIDENCE_THRESHOLD, CUSTOM_LABELS_PATH
-from disease_info import PLANTVILLAGE_LABELS, get_disease_info, get_action_plan, format_label
+import queue
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    MODEL_PATH, IMAGE_SIZE, CONFIDENCE_THRESHOLD, CUSTOM_LABELS_PATH, JPEG_DRAFT, RESAMPLE_FILTER,
+    TTA_ENABLED, TTA_VIEWS, TTA_BAND_LOW, TTA_BAND_HIGH,
+    TFLITE_RUNTIME, INTERPRETER_THREADS, XNNPACK_ENABLED, XNNPACK_LATEST_FEATURES,
+    MODEL_POOL_SIZE, INFERENCE_MODE, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    INFERENCE_WORKERS, INFERENCE_WORKER_TIMEOUT, WARMUP_INVOKES,
+    MAX_CONCURRENT_INFERENCES, MAX_QUEUED_INFERENCES,
+    PREDICTION_CACHE_ENABLED, PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES,
+    PREDICTION_CACHE_TTL_SECONDS, NEAR_DUPLICATE_ENABLED, NEAR_DUPLICATE_MAX_DISTANCE,
+    NEAR_DUPLICATE_CAPACITY, NEAR_DUPLICATE_TTL_SECONDS,
+)
+from disease_info import PLANTVILLAGE_LABELS, get_disease_info, get_action_plan, format_label, crop_of, crop_key, crop_alias
+from admission import AdmissionController, DeadlineExceeded, Overloaded
+from metrics import REGISTRY, TTA_RUNS, detach_request_timings, stage, unobserved_stages
 
 logger = logging.getLogger(__name__)
 
-# ── TFLite Import (Windows compatible) ───────────────────────
-try:
+
+class CorruptImage(ValueError):
+    """An upload whose header checked out but whose pixel data does not decode."""
+
+# ── TFLite runtime selection ─────────────────────────────────
+# Lightweight runtimes first — they import in tens of milliseconds where
+# full TensorFlow takes seconds and hundreds of MB. Nothing is imported
+# until the first model is built, so importing this module stays cheap.
+INTERPRETER_PROVIDERS = {
+    "ai_edge_litert": "ai_edge_litert.interpreter",
+    "tflite_runtime": "tflite_runtime.interpreter",
+    "tensorflow":     "tensorflow.lite.python.interpreter",
+}
+
+_interpreter_class = None
+_interpreter_runtime = None
+_interpreter_module = None
+
+
+def load_interpreter_class(runtime: str = TFLITE_RUNTIME):
+    """Import and cache the Interpreter class from the first available TFLite runtime."""
+    global _interpreter_class, _interpreter_runtime, _interpreter_module
+    if _interpreter_class is not None:
+        return _interpreter_class
+
+    if runtime == "auto":
+        candidates = list(INTERPRETER_PROVIDERS)
+    elif runtime in INTERPRETER_PROVIDERS:
+        candidates = [runtime]
+    else:
+        raise ValueError(f"Unknown TFLITE_RUNTIME: {runtime!r} (choose auto or {', '.join(INTERPRETER_PROVIDERS)})")
+
     import warnings
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        from tensorflow.lite.python.interpreter import Interpreter
-    logger.info("Using tensorflow.lite")
-except ImportError:
-    raise ImportError("TensorFlow not found. Run: pip install tensorflow")
+    for name in candidates:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                module = importlib.import_module(INTERPRETER_PROVIDERS[name])
+        except ImportError:
+            continue
+        _interpreter_class, _interpreter_runtime, _interpreter_module = module.Interpreter, name, module
+        logger.info(f"Using TFLite runtime: {name}")
+        return _interpreter_class
+
+    raise ImportError(
+        "No TFLite runtime found. Run: pip install ai-edge-litert "
+        "(or tflite-runtime, or tensorflow)"
+    )
+
+
+RESAMPLE_FILTERS = {
+    "NEAREST":  Image.NEAREST,
+    "BILINEAR": Image.BILINEAR,
+    "BOX":      Image.BOX,
+    "LANCZOS":  Image.LANCZOS,
+}
+
+
+def interpreter_options(num_threads: int = None) -> dict:
+    """Keyword arguments for Interpreter() from the thread and XNNPACK settings."""
+    load_interpreter_class()
+    options = {}
+    if num_threads:
+        options["num_threads"] = num_threads
+    if not XNNPACK_ENABLED:
+        options["experimental_op_resolver_type"] = _interpreter_module.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+    if XNNPACK_LATEST_FEATURES:
+        options["experimental_default_delegate_latest_features"] = True
+    return options
+
+
+def parse_thread_setting(value: str = INTERPRETER_THREADS):
+    """INTERPRETER_THREADS → None (runtime default), "auto", or a thread count."""
+    value = (value or "").strip().lower()
+    if value in ("", "default"):
+        return None
+    if value == "auto":
+        return "auto"
+    return max(1, int(value))
+
+
+def autotune_threads(model_content: bytes, concurrency: int, candidates: list = None,
+                     runs: int = 30) -> tuple:
+    """
+    Benchmark interpreter thread counts at a given concurrency.
+
+    For each candidate, `concurrency` interpreters invoke() in parallel from
+    their own threads — the way the pool runs under load — and the p95 of all
+    invoke latencies is recorded. Returns (best thread count, {threads: stats}).
+    """
+    import os
+    import threading
+
+    cpus = os.cpu_count() or 1
+    if candidates is None:
+        candidates = sorted({1, 2, 4, cpus} & set(range(1, cpus + 1)))
+    concurrency = max(1, concurrency)
+
+    results = {}
+    for threads in candidates:
+        models = [CropDiseaseModel(model_content=model_content, labels=[], num_threads=threads)
+                  for _ in range(concurrency)]
+        latencies = [[] for _ in models]
+
+        def worker(model, samples):
+            batch = np.zeros((1, model.img_height, model.img_width, 3), dtype=model.input_dtype)
+            with unobserved_stages():   # not real requests' invokes
+                model.infer(batch)  # first invoke pays for lazy initialisation
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    model.infer(batch)
+                    samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(m, l)) for m, l in zip(models, latencies)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall = time.perf_counter() - start
+
+        ms = np.concatenate([np.asarray(l) for l in latencies]) * 1000.0
+        results[threads] = {
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "throughput_per_s": round(len(ms) / wall, 1),
+        }
+
+    best = min(results, key=lambda t: results[t]["p95_ms"])
+    return best, results
+
+
+def estimate_arena_bytes(interpreter, fallback: int = 0) -> int:
+    """
+    Peak bytes of activation tensors alive at once, at the current input shape.
+
+    Walks the ops in order, keeping each op's outputs (and the graph inputs)
+    alive until their last reader. Weights are read by ops but never written,
+    so they are left out. The runtime's own arena planner lands close to this.
+    Returns `fallback` on runtimes that do not list their ops.
+    """
+    sizes = {t["index"]: int(np.prod(t["shape"])) * np.dtype(t["dtype"]).itemsize
+             for t in interpreter.get_tensor_details()}
+    try:
+        # Private API, and not in every runtime
+        op_details = interpreter._get_ops_details()
+    except (AttributeError, RuntimeError) as e:
+        logger.warning(f"Cannot list the model's ops ({e}) — estimating its arena from the file size")
+        return fallback
+    # A delegate node stands in for ops that are still listed individually
+    ops = [op for op in op_details if op["op_name"] != "DELEGATE"]
+    graph_outputs = {d["index"] for d in interpreter.get_output_details()}
+
+    born = {d["index"]: 0 for d in interpreter.get_input_details()}
+    for step, op in enumerate(ops):
+        for t in op["outputs"].tolist():
+            born.setdefault(t, step)
+    last_read = {t: len(ops) if t in graph_outputs else step for t, step in born.items()}
+    for step, op in enumerate(ops):
+        for t in op["inputs"].tolist():
+            if t in born:
+                last_read[t] = max(last_read[t], step)
+
+    peak = 0
+    for step in range(len(ops)):
+        live = sum(sizes.get(t, 0) for t in born if born[t] <= step <= last_read[t])
+        peak = max(peak, live)
+    return peak
+
+
+def rss_bytes(pid="self"):
+    """Resident set size of a process in bytes, or None where /proc is unavailable."""
+    import os
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def crop_classes(labels: list) -> dict:
+    """{crop key: class indices} for labels named "Crop___Disease"; empty for crop-agnostic labels."""
+    crops = {}
+    for i, label in enumerate(labels):
+        crop = crop_of(label)
+        if crop is not None:
+            crops.setdefault(crop_key(crop), []).append(i)
+    return {key: np.array(indices) for key, indices in crops.items()}
+
+
+def crop_aliases(labels: list) -> dict:
+    """{alias: crop key} for crops whose first word differs from their key ('corn' → 'cornmaize')."""
+    aliases, taken = {}, set()
+    for crop in {crop_of(label) for label in labels} - {None}:
+        alias, key = crop_alias(crop), crop_key(crop)
+        if alias and alias != key:
+            if alias in aliases:
+                taken.add(alias)   # shared by two crops, so it names neither
+            aliases[alias] = key
+    return {alias: key for alias, key in aliases.items() if alias not in taken}
+
+
+def find_crop(crops: dict, name: str, aliases: dict = None):
+    """The key in `crops` that `name` refers to, exactly or by alias, or None."""
+    key = crop_key(name)
+    if key in crops:
+        return key
+    key = (aliases or {}).get(key)
+    return key if key in crops else None
 
 
 class CropDiseaseModel:
-    def __init__(self):
-        logger.info(f"Loading model from: {MODEL_PATH}")
+    def __init__(self, model_content: bytes = None, labels: list = None, num_threads: int = None,
+                 model_path: str = MODEL_PATH, labels_path: str = CUSTOM_LABELS_PATH):
+        Interpreter = load_interpreter_class()
+        self.model_path  = model_path
+        self.labels_path = labels_path
+        options = interpreter_options(num_threads)
+        self.num_threads = num_threads
+        # Seconds spent in each load step, reported in the startup breakdown
+        self.load_timings = {}
+
+        start = time.perf_counter()
         import warnings
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            self.interpreter = Interpreter(model_path=MODEL_PATH)
+            if model_content is None:
+                logger.info(f"Loading model from: {model_path}")
+                self.interpreter = Interpreter(model_path=model_path, **options)
+            else:
+                self.interpreter = Interpreter(model_content=model_content, **options)
+        self.load_timings["interpreter"] = time.perf_counter() - start
+
+        start = time.perf_counter()
         self.interpreter.allocate_tensors()
+        self.load_timings["allocate_tensors"] = time.perf_counter() - start
 
         self.input_details  = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
@@ -41,22 +278,40 @@ class CropDiseaseModel:
             self.img_height, self.img_width = IMAGE_SIZE
 
         self.input_dtype = self.input_details[0]['dtype']
+
+        if RESAMPLE_FILTER not in RESAMPLE_FILTERS:
+            raise ValueError(
+                f"Unknown RESAMPLE_FILTER: {RESAMPLE_FILTER!r} (choose from {', '.join(RESAMPLE_FILTERS)})"
+            )
+        self.jpeg_draft = JPEG_DRAFT
+        self.resample   = RESAMPLE_FILTERS[RESAMPLE_FILTER]
+        self._batch_size = int(input_shape[0]) if len(input_shape) == 4 else 1
+        # Callable returning a numpy view of the interpreter's own input buffer
+        self._input_tensor = self.interpreter.tensor(self.input_details[0]['index'])
         logger.info(f"Model expects: {self.img_height}x{self.img_width}, dtype={self.input_dtype.__name__}")
 
-        self.labels = self._load_labels()
+        start = time.perf_counter()
+        self.labels = labels if labels is not None else self._load_labels()
+        self._build_payloads()
+        self.load_timings["labels"] = time.perf_counter() - start
         logger.info(f"Loaded {len(self.labels)} class labels")
 
     def _load_labels(self) -> list:
-        if CUSTOM_LABELS_PATH:
+        num_outputs = self.output_details[0]['shape'][1] if len(self.output_details[0]['shape']) == 2 else 0
+
+        if self.labels_path:
             try:
-                with open(CUSTOM_LABELS_PATH, 'r') as f:
+                with open(self.labels_path, 'r') as f:
                     labels = [line.strip() for line in f if line.strip()]
-                logger.info(f"Loaded {len(labels)} custom labels from {CUSTOM_LABELS_PATH}")
-                return labels
+                if num_outputs == 38 and len(labels) != 38:
+                    # A shared labels file written for another model — e.g. a 6-class
+                    # labels.txt next to a PlantVillage model served alongside it
+                    logger.warning(f"{self.labels_path} has {len(labels)} labels but the model has 38 classes")
+                else:
+                    logger.info(f"Loaded {len(labels)} custom labels from {self.labels_path}")
+                    return labels
             except FileNotFoundError:
-                logger.warning(f"Custom labels file not found: {CUSTOM_LABELS_PATH}")
-
-        num_outputs = self.output_details[0]['shape'][1] if len(self.output_details[0]['shape']) == 2 else 0
+                logger.warning(f"Custom labels file not found: {self.labels_path}")
 
         if num_outputs == 38:
             logger.info("Using built-in PlantVillage 38-class labels")
@@ -68,28 +323,108 @@ class CropDiseaseModel:
         )
         return [f"Class_{i}" for i in range(num_outputs)]
 
-    def preprocess(self, image_bytes: bytes) -> np.ndarray:
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = img.resize((self.img_width, self.img_height), Image.LANCZOS)
-        arr = np.array(img)
+    def decode(self, image_bytes: bytes) -> Image.Image:
+        """Decode an upload into an upright RGB image at the model's input size."""
+        return self.resize(self.open_image(image_bytes))
+
+    def open_image(self, image_bytes: bytes) -> Image.Image:
+        """Decode an upload into an upright RGB image, before the resize to the input size."""
+        with stage("decode"):
+            try:
+                img = Image.open(io.BytesIO(image_bytes))
+                if self.jpeg_draft and img.format == "JPEG":
+                    # Let libjpeg skip DCT detail we would throw away in the resize anyway
+                    img.draft("RGB", (self.img_width, self.img_height))
+                # Phone cameras store rotation in EXIF rather than in the pixels
+                ImageOps.exif_transpose(img, in_place=True)
+                return img.convert("RGB")
+            except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+                # validate_image only reads the header; a truncated or corrupt body fails here
+                raise CorruptImage(f"Could not decode the image — the file may be truncated or corrupt ({e}).") from e
+
+    def resize(self, img: Image.Image) -> Image.Image:
+        with stage("resize"):
+            return img.resize((self.img_width, self.img_height), self.resample)
+
+    def augmented_views(self, img: Image.Image, resized: Image.Image, count: int) -> list:
+        """
+        The first `count` test-time augmentation views of a photo, at the input size.
+
+        `img` is the photo from open_image() and `resized` the plain view made
+        from it, which the mirror view reuses. Crops are cut from `img` during
+        the resize itself, so no intermediate copy is made.
+        """
+        width, height = img.size
+        crop_w, crop_h = round(width * TTA_CROP), round(height * TTA_CROP)
+        lefts = {"center": (width - crop_w) // 2, "left": 0, "right": width - crop_w}
+        tops  = {"center": (height - crop_h) // 2, "top": 0, "bottom": height - crop_h}
+        size = (self.img_width, self.img_height)
+
+        views = []
+        for crop, mirrored in TTA_VIEW_KINDS[:count]:
+            if crop is None:
+                view = resized
+            else:
+                vertical, _, horizontal = crop.partition("_")
+                left, top = lefts[horizontal or vertical], tops[vertical]
+                view = img.resize(size, self.resample, box=(left, top, left + crop_w, top + crop_h))
+            views.append(view.transpose(Image.Transpose.FLIP_LEFT_RIGHT) if mirrored else view)
+        return views
+
+    def preprocess(self, image_bytes: bytes, out: np.ndarray = None) -> np.ndarray:
+        """
+        Decode an upload into model input.
+
+        With `out` — an [H, W, 3] array of the input dtype, such as a slot of a
+        preallocated buffer — the pixels are written into it and nothing else
+        is allocated. Without it a new [1, H, W, 3] batch is returned.
+        """
+        img = self.decode(image_bytes)
+        if out is None:
+            batch = np.empty((1, self.img_height, self.img_width, 3), dtype=self.input_dtype)
+            self.load_pixels(img, batch[0])
+            return batch
+        return self.load_pixels(img, out)
+
+    def load_pixels(self, img: Image.Image, out: np.ndarray) -> np.ndarray:
+        """Copy a decoded image into `out`, converting to the input dtype in place."""
+        np.copyto(out, np.asarray(img), casting="unsafe")
 
         # YOUR model is uint8 — keep raw pixel values, do NOT divide by 255
         if self.input_dtype == np.float32:
-            arr = arr.astype(np.float32) / 255.0
-        elif self.input_dtype == np.uint8:
-            arr = arr.astype(np.uint8)
-        else:
-            arr = arr.astype(self.input_dtype)
+            out /= 255.0
+        return out
 
-        return np.expand_dims(arr, axis=0)
+    def _resize_input(self, batch_size: int):
+        if batch_size != self._batch_size:
+            # Resizing is cheap next to invoke(), so track the last batch size only
+            self.interpreter.resize_tensor_input(
+                self.input_details[0]['index'], [batch_size, self.img_height, self.img_width, 3]
+            )
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
 
-    def predict(self, image_bytes: bytes) -> dict:
-        input_tensor = self.preprocess(image_bytes)
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_tensor)
-        self.interpreter.invoke()
+    def infer(self, inputs) -> np.ndarray:
+        """
+        Run the interpreter on [N, H, W, 3] inputs and return [N, classes] scores.
+
+        `inputs` may be one array or a list of [H, W, 3] rows; rows are copied
+        straight into the interpreter's input tensor without stacking them first.
+        """
+        self._resize_input(len(inputs))
+        buffer = self._input_tensor()
+        for i, row in enumerate(inputs):
+            buffer[i] = row
+        # The interpreter refuses to invoke() while views of its buffers are alive
+        del buffer
+        return self._invoke()
+
+    def _invoke(self) -> np.ndarray:
+        with stage("invoke"):
+            self.interpreter.invoke()
         output = self.interpreter.get_tensor(self.output_details[0]['index'])
 
-        scores = output[0].astype(np.float32)
+        scores = output.astype(np.float32)
 
         # Dequantize uint8 output if needed
         out_detail = self.output_details[0]
@@ -97,64 +432,651 @@ class CropDiseaseModel:
             scale, zero_point = out_detail['quantization']
             if scale != 0:
                 scores = (scores - zero_point) * scale
-            # Softmax
-            scores = np.exp(scores - np.max(scores))
-            scores = scores / scores.sum()
+            # Softmax (per row)
+            scores = np.exp(scores - np.max(scores, axis=1, keepdims=True))
+            scores = scores / scores.sum(axis=1, keepdims=True)
+
+        return scores
+
+    def infer_image(self, img: Image.Image) -> np.ndarray:
+        """Run one decoded image, written straight into the input tensor, and return its scores."""
+        self._resize_input(1)
+        self.load_pixels(img, self._input_tensor()[0])
+        return self._invoke()[0]
+
+    def infer_images(self, images: list) -> np.ndarray:
+        """Run decoded images as one batch, written straight into the input tensor."""
+        self._resize_input(len(images))
+        buffer = self._input_tensor()
+        for i, img in enumerate(images):
+            self.load_pixels(img, buffer[i])
+        del buffer
+        return self._invoke()
+
+    def predict(self, image_bytes: bytes) -> dict:
+        # Decode before touching the input buffer so a bad upload leaves no view behind
+        img = self.decode(image_bytes)
+        return self.postprocess(self.infer_image(img))
 
-        top_index  = int(np.argmax(scores))
-        confidence = float(scores[top_index])
+    def postprocess(self, scores: np.ndarray, classes: np.ndarray = None) -> dict:
+        """
+        Turn one row of class scores into the /predict response dict.
+
+        With `classes` (indices, e.g. one crop's) only those classes can be
+        predicted. The confidence threshold still applies to the model's own
+        score for the top one; only if it passes are the displayed scores
+        renormalized to sum to 1 over those classes.
+        """
+        with stage("postprocess"):
+            return self._postprocess(scores, classes)
+
+    def _postprocess(self, scores: np.ndarray, classes: np.ndarray = None) -> dict:
+        if classes is None:
+            ranked = np.argsort(scores)[-3:][::-1]
+        else:
+            subset = scores[classes]
+            restricted = np.zeros_like(scores)
+            restricted[classes] = subset
+            # Renormalizing first would make a crop with few classes look certain
+            if float(subset.max()) >= CONFIDENCE_THRESHOLD:
+                restricted[classes] /= subset.sum() or 1.0
+            scores = restricted
+            ranked = classes[np.argsort(subset)[-3:][::-1]]
+
+        # One .tolist() gives plain Python floats — no per-element NumPy scalar conversions,
+        # and nothing any JSON encoder needs help with
+        values = scores.tolist()
+        confidence = max(values)
+        top_index = values.index(confidence)   # first maximum, as np.argmax
 
-        top3_indices = np.argsort(scores)[-3:][::-1]
         top3 = [
-            {
-                "label": format_label(self.labels[i]) if i < len(self.labels) else f"Class {i}",
-                "raw_label": self.labels[i] if i < len(self.labels) else f"Class_{i}",
-                "confidence": round(float(scores[i]), 4),
-            }
-            for i in top3_indices
+            {**self._label_names[i], "confidence": round(values[i], 4)}
+            for i in ranked.tolist()
         ]
 
-        if confidence < CONFIDENCE_THRESHOLD:
-            return {
-                "disease": "Unrecognized",
-                "raw_label": "unknown",
-                "confidence": round(confidence, 4),
-                "description": "Could not confidently identify the disease. Please retake in bright natural light with the diseased area filling the frame.",
-                "treatment": [
-                    "Retake photo in bright natural light",
-                    "Ensure the diseased area fills the frame",
-                    "Consult your local agricultural officer",
-                ],
-                "pesticide": "N/A",
-                "soil_treatment": "N/A",
-                "action_plan": [],
-                "top3": top3,
-                "status": "low_confidence",
-            }
-
-        raw_label   = self.labels[top_index] if top_index < len(self.labels) else f"Class_{top_index}"
-        info        = get_disease_info(raw_label)
-        action_plan = get_action_plan(raw_label)
+        # Shallow copy of the prebuilt payload: the nested lists are shared, never mutate them
+        result = dict(LOW_CONFIDENCE_PAYLOAD if confidence < CONFIDENCE_THRESHOLD else self._payloads[top_index])
+        result["confidence"] = round(confidence, 4)
+        result["top3"] = top3
+        return result
+
+    def _build_payloads(self):
+        """
+        Prebuild every per-label piece of the /predict response once, at load.
+
+        Labels are fixed for the life of the model, so postprocess() only has
+        to fill in the confidence and top-3 scores.
+        """
+        num_classes = max(len(self.labels), int(self.output_details[0]['shape'][-1]))
+        self._label_names = []
+        self._payloads = []
+        for i in range(num_classes):
+            if i < len(self.labels):
+                raw_label, display_name = self.labels[i], format_label(self.labels[i])
+            else:
+                raw_label, display_name = f"Class_{i}", f"Class {i}"
+            self._label_names.append({"label": display_name, "raw_label": raw_label})
+
+            info = get_disease_info(raw_label)
+            self._payloads.append({
+                "disease":        format_label(raw_label),
+                "raw_label":      raw_label,
+                "confidence":     None,
+                "severity":       info.get("severity", "unknown"),
+                "description":    info.get("description", ""),
+                "treatment":      info.get("treatment", []),
+                "pesticide":      info.get("pesticide", ""),
+                "soil_treatment": info.get("soil_treatment", ""),
+                "action_plan":    get_action_plan(raw_label),
+                "top3":           None,
+                "status":         "success",
+            })
+
 
+# Test-time augmentation views, in the order TTA_VIEWS takes them: (crop, mirrored).
+# Crops keep TTA_CROP of each side; None is the whole photo.
+TTA_CROP = 0.875
+TTA_VIEW_KINDS = (
+    (None, True), ("center", False), ("top_left", False), ("top_right", False),
+    ("bottom_left", False), ("bottom_right", False), ("center", True), ("top_left", True),
+    ("top_right", True), ("bottom_left", True), ("bottom_right", True),
+)
+
+# Response for predictions under CONFIDENCE_THRESHOLD; confidence and top3 are filled in per request
+LOW_CONFIDENCE_PAYLOAD = {
+    "disease": "Unrecognized",
+    "raw_label": "unknown",
+    "confidence": None,
+    "description": "Could not confidently identify the disease. Please retake in bright natural light with the diseased area filling the frame.",
+    "treatment": [
+        "Retake photo in bright natural light",
+        "Ensure the diseased area fills the frame",
+        "Consult your local agricultural officer",
+    ],
+    "pesticide": "N/A",
+    "soil_treatment": "N/A",
+    "action_plan": [],
+    "top3": None,
+    "status": "low_confidence",
+}
+
+
+class BatchScheduler:
+    """
+    Groups concurrent requests into a single batched invoke().
+
+    Requests queue up on the event loop; a batch is closed when it holds
+    max_batch_size inputs or max_wait_ms after its first input arrived, then
+    runs on the pool's executor while the next batch forms.
+    """
+
+    def __init__(self, pool: "ModelPool", max_batch_size: int = BATCH_MAX_SIZE,
+                 max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.batch_sizes = Counter()
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._collect())
+
+    async def submit(self, input_row: np.ndarray) -> np.ndarray:
+        """
+        Queue one [H, W, 3] input row and wait for its scores.
+
+        The row belongs to the scheduler from here on: it goes back to the
+        pool's free rows once its batch has run, even if the caller is cancelled.
+        """
+        self._ensure_running()
+        future = self._loop.create_future()
+        # The batched invoke() is observed once per batch; the request sees its wait plus that invoke
+        with stage("invoke", observe=False):
+            await self._queue.put((input_row, future))
+            return await future
+
+    async def _collect(self):
+        # Started from whichever request came first — its timings must not collect every batch
+        detach_request_timings()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                try:
+                    if timeout <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        # Requests cancelled while their batch formed are left out of it
+        live = [(row, future) for row, future in batch if not future.done()]
+        try:
+            if not live:
+                return
+            self.batch_sizes[len(live)] += 1
+            inputs = [row for row, _ in live]
+            try:
+                scores = await self._loop.run_in_executor(self.pool.executor, self.pool.infer, inputs)
+            except Exception as e:
+                for _, future in live:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), row in zip(live, scores):
+                if not future.done():
+                    future.set_result(row)
+        finally:
+            for row, _ in batch:
+                self.pool._rows.put_nowait(row)
+
+    def stats(self) -> dict:
+        batches  = sum(self.batch_sizes.values())
+        requests = sum(size * count for size, count in self.batch_sizes.items())
         return {
-            "disease":        format_label(raw_label),
-            "raw_label":      raw_label,
-            "confidence":     round(confidence, 4),
-            "severity":       info.get("severity", "unknown"),
-            "description":    info.get("description", ""),
-            "treatment":      info.get("treatment", []),
-            "pesticide":      info.get("pesticide", ""),
-            "soil_treatment": info.get("soil_treatment", ""),
-            "action_plan":    action_plan,
-            "top3":           top3,
-            "status":         "success",
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "requests": requests,
+            "mean_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
         }
 
 
-_model_instance = None
+class ModelPool:
+    """
+    A fixed set of CropDiseaseModel instances served from a thread pool.
+
+    TFLite interpreters are not thread-safe, so every prediction checks out
+    an idle instance for its whole duration. The model file is read once and
+    each interpreter is built from the same bytes.
+    """
+
+    def __init__(self, size: int = MODEL_POOL_SIZE, mode: str = INFERENCE_MODE, model_path: str = MODEL_PATH,
+                 labels_path: str = CUSTOM_LABELS_PATH, version: str = "default"):
+        if mode not in ("pool", "batch", "process"):
+            raise ValueError(f"Unknown INFERENCE_MODE: {mode!r}")
+        # In process mode the in-process model only serves metadata and postprocessing
+        size = 1 if mode == "process" else max(1, size)
+        self.load_timings = {}
+        pool_start = start = time.perf_counter()
+        load_interpreter_class()
+        self.load_timings["runtime_import"] = time.perf_counter() - start
+        self.runtime = _interpreter_runtime
+
+        # Registry name of this model, reported with every prediction it serves
+        self.version = version
+        logger.info(f"Loading model {version} from: {model_path} (pool size {size})")
+        start = time.perf_counter()
+        with open(model_path, "rb") as f:
+            self.model_content = f.read()
+        self.load_timings["read_model"] = time.perf_counter() - start
+
+        num_threads = parse_thread_setting()
+        self.thread_tuning = None
+        if num_threads == "auto":
+            start = time.perf_counter()
+            concurrency = INFERENCE_WORKERS if mode == "process" else size
+            num_threads, self.thread_tuning = autotune_threads(self.model_content, concurrency)
+            self.load_timings["thread_autotune"] = time.perf_counter() - start
+            logger.info(f"Auto-tuned interpreter threads: {num_threads} (concurrency {concurrency}) — {self.thread_tuning}")
+        self.num_threads = num_threads
+
+        first = CropDiseaseModel(model_content=self.model_content, num_threads=num_threads, labels_path=labels_path)
+        self.models = [first] + [
+            CropDiseaseModel(model_content=self.model_content, labels=first.labels, num_threads=num_threads)
+            for _ in range(size - 1)
+        ]
+        for step in ("interpreter", "allocate_tensors", "labels"):
+            self.load_timings[step] = sum(m.load_timings[step] for m in self.models)
+
+        # Fingerprint of the weights and labels — cached results never outlive either
+        fingerprint = hashlib.sha256(self.model_content)
+        fingerprint.update("\n".join(first.labels).encode())
+        self.model_version = fingerprint.hexdigest()[:16]
+        # Class indices per crop, for ?crop= — empty when the labels carry no crop names
+        self.crops = crop_classes(first.labels)
+        self.crop_aliases = crop_aliases(first.labels)
+
+        self.cache = None
+        if PREDICTION_CACHE_ENABLED:
+            from cache import PredictionCache
+            self.cache = PredictionCache(
+                PREDICTION_CACHE_MAX_ENTRIES, PREDICTION_CACHE_MAX_BYTES, PREDICTION_CACHE_TTL_SECONDS
+            )
+
+        self.near_duplicates = None
+        if NEAR_DUPLICATE_ENABLED:
+            from cache import NearDuplicateIndex
+            self.near_duplicates = NearDuplicateIndex(
+                NEAR_DUPLICATE_CAPACITY, NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_TTL_SECONDS
+            )
+
+        # Extra views per ambiguous prediction (0 = test-time augmentation off)
+        self.tta_views = min(max(0, TTA_VIEWS), len(TTA_VIEW_KINDS)) if TTA_ENABLED else 0
+
+        self.warm = False
+        self.warmup_batch_sizes = []
+        # Leases held by routed requests — a swapped-out pool is closed once this drops to 0
+        self.in_flight = 0
+        self._idle = queue.SimpleQueue()
+        for model in self.models:
+            self._idle.put(model)
+        self.mode = mode
+        self.scheduler = None
+        self._rows = None
+        if mode == "batch":
+            self.scheduler = BatchScheduler(self)
+            # Reusable input rows: one full batch per interpreter plus the one still forming.
+            # Taken on the event loop, so waiting for one never ties up an executor thread
+            # that a batch needs to run and hand its rows back.
+            self._rows = asyncio.Queue()
+            for _ in range((size + 1) * self.scheduler.max_batch_size):
+                self._rows.put_nowait(np.empty((self.img_height, self.img_width, 3), dtype=self.input_dtype))
+        self.workers = None
+        threads = size
+        if mode == "process":
+            from workers import ProcessWorkerPool
+            # Two slots (and preprocessing threads) per worker keep every worker busy
+            threads = 2 * max(1, INFERENCE_WORKERS)
+            self.workers = ProcessWorkerPool(
+                self.model_content,
+                (self.img_height, self.img_width, 3),
+                self.input_dtype,
+                num_workers=INFERENCE_WORKERS,
+                num_slots=threads,
+                timeout=INFERENCE_WORKER_TIMEOUT,
+                num_threads=num_threads,
+            )
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="inference")
+
+        # By default admit as many predictions as can actually run: one per interpreter,
+        # one per input row in batch mode, one per input slot in process mode.
+        # Batch mode never admits more than it has rows, so an admitted request never waits for one.
+        max_concurrent = MAX_CONCURRENT_INFERENCES or threads
+        if mode == "batch":
+            max_concurrent = min(MAX_CONCURRENT_INFERENCES or self._rows.qsize(), self._rows.qsize())
+        self.admission = AdmissionController(max_concurrent, MAX_QUEUED_INFERENCES)
+
+        # Lower bound on the footprint, for the registry's memory budget (which
+        # measures the real one where it can): the model, plus an arena per
+        # interpreter sized for the largest batch it runs and, with XNNPACK, its
+        # repacked copy of the weights. Worker processes count too.
+        num_workers = self.workers.num_workers if self.workers is not None else 0
+        max_batch = max(1, self.tta_views, self.scheduler.max_batch_size if self.scheduler is not None else 1)
+        arena = estimate_arena_bytes(first.interpreter, fallback=len(self.model_content))
+        packed = len(self.model_content) if XNNPACK_ENABLED else 0
+        self.memory_bytes = (len(self.model_content) * (1 + num_workers)
+                             + (arena * max_batch + packed) * len(self.models) + (arena + packed) * num_workers)
+        self.load_timings["total"] = time.perf_counter() - pool_start
+
+    # Model metadata is identical across the pool — expose the first instance's
+    @property
+    def labels(self) -> list:
+        return self.models[0].labels
+
+    @property
+    def img_height(self) -> int:
+        return self.models[0].img_height
+
+    @property
+    def img_width(self) -> int:
+        return self.models[0].img_width
+
+    @property
+    def input_dtype(self):
+        return self.models[0].input_dtype
+
+    @property
+    def size(self) -> int:
+        return len(self.models)
+
+    def find_crop(self, name: str):
+        """This model's key for crop `name`, or None if it has no classes for it."""
+        return find_crop(self.crops, name, self.crop_aliases)
+
+    def predict(self, image_bytes: bytes, classes: np.ndarray = None) -> dict:
+        """Run a prediction, blocking until an interpreter (or worker) is free."""
+        # Decoding only reads model metadata, so it happens before taking an interpreter
+        model = self.models[0]
+        original = model.open_image(image_bytes)
+        img = model.resize(original)
+        fingerprint, scores = self._find_near_duplicate(img)
+        if scores is None:
+            scores = self._infer_image(img)
+            if self._is_ambiguous(scores):
+                scores = self._augment(original, img, scores)
+            self._remember(fingerprint, scores)
+        return model.postprocess(scores, classes)
+
+    def infer(self, inputs) -> np.ndarray:
+        """Run preprocessed [N, H, W, 3] inputs on an idle interpreter."""
+        model = self._idle.get()
+        try:
+            return model.infer(inputs)
+        finally:
+            self._idle.put(model)
+
+    def _infer_image(self, img: Image.Image) -> np.ndarray:
+        if self.workers is not None:
+            slot = self.workers.acquire()
+            try:
+                self.models[0].load_pixels(img, self.workers.slots[slot])
+                # The worker's own timings stay in its process, so time the round trip here
+                with stage("invoke"):
+                    return self.workers.run(slot)
+            finally:
+                self.workers.release(slot)
+
+        model = self._idle.get()
+        try:
+            return model.infer_image(img)
+        finally:
+            self._idle.put(model)
+
+    def _is_ambiguous(self, scores: np.ndarray) -> bool:
+        """Whether a plain prediction is close enough to the threshold to be worth augmenting."""
+        return self.tta_views > 0 and TTA_BAND_LOW <= float(scores.max()) < TTA_BAND_HIGH
+
+    def _augment(self, original: Image.Image, img: Image.Image, scores: np.ndarray) -> np.ndarray:
+        """Average `scores` with those of the photo's TTA views, run as one batched invoke."""
+        with stage("tta_views"):
+            views = self.models[0].augmented_views(original, img, self.tta_views)
+        # Always on an in-process interpreter: process-mode workers only take single inputs
+        model = self._idle.get()
+        try:
+            view_scores = model.infer_images(views)
+        finally:
+            self._idle.put(model)
+        averaged = (scores + view_scores.sum(axis=0)) / (len(views) + 1)
+
+        before = float(scores.max()) >= CONFIDENCE_THRESHOLD
+        after = float(averaged.max()) >= CONFIDENCE_THRESHOLD
+        TTA_RUNS.inc("recovered" if after and not before else "dropped" if before and not after else "unchanged")
+        return averaged
+
+    def _find_near_duplicate(self, img: Image.Image) -> tuple:
+        """Return (perceptual fingerprint, cached scores or None) for a decoded image."""
+        if self.near_duplicates is None:
+            return None, None
+        from cache import image_fingerprint
+        fingerprint = image_fingerprint(img)
+        return fingerprint, self.near_duplicates.lookup(fingerprint)
+
+    def _remember(self, fingerprint, scores: np.ndarray):
+        if self.near_duplicates is not None and fingerprint is not None:
+            self.near_duplicates.add(fingerprint, scores)
+
+    async def predict_async(self, image_bytes: bytes, deadline: float = None, crop: str = None) -> dict:
+        """
+        Run a prediction on the pool's executor without blocking the event loop.
+
+        `deadline` (a time.monotonic() value) drops the request if it is still
+        queued by then. Raises admission.Overloaded when the queue is full.
+        `crop`, a key from find_crop(), restricts the prediction to that crop's classes.
+        """
+        return await self._cached_predict(image_bytes, deadline, crop)
+
+    def acquire_lease(self):
+        """
+        Count a routed request as in flight until release_lease(), so a
+        retiring pool is not closed under it. Take it straight after
+        routing, with no await in between.
+        """
+        self.in_flight += 1
+
+    def release_lease(self):
+        self.in_flight -= 1
+
+    async def _cached_predict(self, image_bytes: bytes, deadline: float = None, crop: str = None) -> dict:
+        classes = self.crops[crop] if crop is not None else None
+        if self.cache is None:
+            return await self._admitted_predict(image_bytes, deadline, classes)
+        if len(image_bytes) > 256 * 1024:
+            # Hashing a multi-megabyte photo would hold up the event loop
+            key = await asyncio.to_thread(self.cache.key, image_bytes, self.model_version)
+        else:
+            key = self.cache.key(image_bytes, self.model_version)
+        if crop is not None:
+            key = f"{key}:{crop}"
+        while True:
+            started = False
+
+            def compute():
+                nonlocal started
+                started = True
+                return self._admitted_predict(image_bytes, deadline, classes)
+
+            try:
+                return await self.cache.get_or_compute(key, compute)
+            except (Overloaded, DeadlineExceeded):
+                if started:
+                    raise
+                # Turned away under the deadline of the request this one was coalesced
+                # with — try again under its own (admission enforces that one)
+
+    async def _admitted_predict(self, image_bytes: bytes, deadline: float = None, classes: np.ndarray = None) -> dict:
+        # Cache hits never get here, so only real inference work is queued or turned away
+        with stage("queue_wait"):
+            granted_at = await self.admission.acquire(deadline)
+        try:
+            return await self._predict_async(image_bytes, classes)
+        finally:
+            self.admission.release(granted_at)
+
+    async def _predict_async(self, image_bytes: bytes, classes: np.ndarray = None) -> dict:
+        loop = asyncio.get_running_loop()
+        # run_in_executor does not carry context over, so pass the request's stage timings along
+        context = contextvars.copy_context()
+        if self.scheduler is None:
+            return await loop.run_in_executor(self.executor, context.run, self.predict, image_bytes, classes)
+
+        row = await self._rows.get()
+        preprocessing = loop.run_in_executor(self.executor, context.run, self._preprocess_row, image_bytes, row)
+        try:
+            images, fingerprint, scores = await asyncio.shield(preprocessing)
+        except BaseException:
+            # Failed or cancelled: the row is free again once nothing is writing into it
+            preprocessing.add_done_callback(lambda _: self._rows.put_nowait(row))
+            raise
+        if scores is not None:
+            self._rows.put_nowait(row)
+        else:
+            scores = await self.scheduler.submit(row)
+            if self._is_ambiguous(scores):
+                # The views go straight to an interpreter as their own batch rather than
+                # through the scheduler, so they never wait for free input rows
+                scores = await loop.run_in_executor(self.executor, context.run, self._augment, *images, scores)
+            self._remember(fingerprint, scores)
+        return self.models[0].postprocess(scores, classes)
+
+    def _preprocess_row(self, image_bytes: bytes, row: np.ndarray) -> tuple:
+        """Fill `row`; return ((original, resized) images for TTA, fingerprint, near-duplicate scores)."""
+        # Preprocessing only reads model metadata, so any instance can do it
+        model = self.models[0]
+        original = model.open_image(image_bytes)
+        img = model.resize(original)
+        fingerprint, scores = self._find_near_duplicate(img)
+        if scores is not None:
+            return None, fingerprint, scores
+        # Only keep the decoded photo around while the batch runs if TTA may need it
+        images = (original, img) if self.tta_views else None
+        model.load_pixels(img, row)
+        return images, fingerprint, None
+
+    def warmup(self, runs: int = WARMUP_INVOKES):
+        """
+        Invoke every interpreter `runs` times on blank input at each batch size it will serve.
+
+        The first invokes at a given input shape pay for lazy setup inside the
+        runtime; this makes sure no real request does. Call it before the pool
+        takes traffic.
+        """
+        self.warmup_batch_sizes = [1]
+        if self.scheduler is not None:
+            self.warmup_batch_sizes = list(range(1, self.scheduler.max_batch_size + 1))
+        # TTA views run as one batch on the in-process interpreters, whatever the mode
+        tta_sizes = [self.tta_views] if self.tta_views and self.tta_views not in self.warmup_batch_sizes else []
+        self.warmup_batch_sizes += tta_sizes
+
+        if self.workers is not None:
+            def run_worker(_):
+                slot = self.workers.acquire()
+                try:
+                    self.workers.slots[slot] = 0
+                    self.workers.run(slot)
+                finally:
+                    self.workers.release(slot)
+            # Concurrent tasks, so every worker process gets its share
+            list(self.executor.map(run_worker, range(runs * self.workers.num_workers)))
+        in_process_sizes = tta_sizes if self.workers is not None else self.warmup_batch_sizes
+        # Cold invokes on blank input would skew the invoke histogram
+        with unobserved_stages():
+            for batch_size in in_process_sizes:
+                blank = np.zeros((batch_size, self.img_height, self.img_width, 3), dtype=self.input_dtype)
+                for model in self.models:
+                    for _ in range(runs):
+                        model.infer(blank)
+        self.warm = True
+
+    def queue_depths(self) -> dict:
+        """Work waiting for an interpreter, by queue — read by /metrics at scrape time."""
+        depths = {("admission",): self.admission.queued, ("executor",): self.executor._work_queue.qsize()}
+        if self.scheduler is not None and self.scheduler._queue is not None:
+            depths[("batch",)] = self.scheduler._queue.qsize()
+        if self.workers is not None:
+            depths[("workers",)] = len(self.workers._pending)
+        return depths
+
+    def stats(self) -> dict:
+        stats = {"version": self.version, "mode": self.mode, "pool_size": self.size, "model_version": self.model_version,
+                 "runtime": self.runtime, "num_threads": self.num_threads, "xnnpack": XNNPACK_ENABLED,
+                 "warm": self.warm, "warmup_batch_sizes": self.warmup_batch_sizes,
+                 "memory_mb": round(self.memory_bytes / (1024 * 1024), 1), "crops": sorted(self.crops)}
+        if self.thread_tuning is not None:
+            stats["thread_tuning"] = {str(t): r for t, r in self.thread_tuning.items()}
+        stats["admission"] = self.admission.stats()
+        if self.tta_views:
+            stats["tta"] = {"views": self.tta_views, "band": [TTA_BAND_LOW, TTA_BAND_HIGH]}
+        if self.scheduler is not None:
+            stats["batching"] = self.scheduler.stats()
+        if self.workers is not None:
+            stats["workers"] = self.workers.num_workers
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.workers is not None:
+            self.workers.close()
+
+
+def get_model() -> ModelPool:
+    """The pool serving requests right now. The model registry swaps it atomically on activation."""
+    from registry import get_registry
+    return get_registry().active_pool()
+
+
+# ── Metrics read at scrape time ──────────────────────────────
+
+def _from_pool(read):
+    """Wrap read(pool) as a metric callback that reports nothing until the model is loaded."""
+    def callback():
+        import registry
+        pool = registry._registry.active if registry._registry is not None else None
+        return read(pool) if pool is not None else None
+    return callback
+
+
+def _cache_counts(pool: ModelPool) -> dict:
+    counts = {}
+    if pool.cache is not None:
+        stats = pool.cache.stats()
+        for result in ("hits", "misses", "coalesced", "evictions"):
+            counts[("prediction", result)] = stats[result]
+    if pool.near_duplicates is not None:
+        stats = pool.near_duplicates.stats()
+        for result in ("hits", "misses"):
+            counts[("near_duplicate", result)] = stats[result]
+    return counts
+
 
-def get_model() -> CropDiseaseModel:
-    global _model_instance
-    if _model_instance is None:
-        _model_instance = CropDiseaseModel()
-    return _model_instance
\ No newline at end of file
+REGISTRY.gauge("digital_doctor_queue_depth", "Requests waiting for an interpreter, by queue.",
+               ("queue",), callback=_from_pool(ModelPool.queue_depths))
+REGISTRY.gauge("digital_doctor_idle_interpreters", "In-process interpreters not currently running.",
+               callback=_from_pool(lambda pool: pool._idle.qsize()))
+REGISTRY.counter("digital_doctor_admission_events", "Inference requests admitted, rejected as overloaded, or expired.",
+                 ("result",), callback=_from_pool(lambda pool: {
+                     (result,): getattr(pool.admission, result) for result in ("admitted", "rejected", "expired")
+                 }))
+REGISTRY.counter("digital_doctor_cache_events", "Prediction and near-duplicate cache lookups, by outcome.",
+                 ("cache", "result"), callback=_from_pool(_cache_counts))
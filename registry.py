@@ -0,0 +1,372 @@
+"""
+🗂️  Model Registry — versioned models, hot-swapped without downtime
+===================================================================
+Each version is a folder under MODEL_REGISTRY_DIR:
+
+    models/
+      ├── 2024-06-rust-v2/
+      │     ├── model.tflite
+      │     └── labels.txt      (optional — falls back to CUSTOM_LABELS_PATH)
+      └── ACTIVE                → name of the version to serve
+
+Activating a version builds and warms a complete ModelPool in a background
+thread while the current one keeps serving. The swap itself is a single
+reference assignment: requests that already hold the old pool finish on it.
+The previous pool stays loaded for an instant rollback; the one before it
+is closed once its last request has finished.
+
+Other versions can serve at the same time — a per-crop model next to the
+general one, say. A request names one (?model=) or a crop (?crop=), and
+the version is loaded on first use; past MODEL_MEMORY_BUDGET_MB the least
+recently used of these extra versions are unloaded again.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from config import (
+    MODEL_PATH, CUSTOM_LABELS_PATH, MODEL_REGISTRY_DIR, MODEL_VERSION, MODEL_REGISTRY_POLL_SECONDS,
+    MODEL_PRELOAD, MODEL_MEMORY_BUDGET_MB,
+)
+from model import ModelPool, crop_aliases, crop_classes, find_crop, load_interpreter_class, rss_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERSION = "default"
+ACTIVE_FILE = "ACTIVE"
+
+
+class ModelNotReady(RuntimeError):
+    """No model is serving yet: the startup load is still running, or it failed."""
+
+
+class ModelRegistry:
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+        self.active = None      # ModelPool serving requests
+        self.previous = None    # ModelPool kept loaded for rollback
+        self.loading = None     # version currently being built, if any
+        self.last_error = None
+        self.history = []       # (timestamp, event) — activations and rollbacks
+        self.resident = OrderedDict()   # other versions loaded on demand, least recently used first
+        self._loads = {}                # version → task loading it on demand
+        self._retiring = set()
+
+    # ── Discovery ────────────────────────────────────────────
+
+    def versions(self) -> dict:
+        """{version: (model_path, labels_path)} for every model on disk."""
+        versions = {DEFAULT_VERSION: (MODEL_PATH, CUSTOM_LABELS_PATH)}
+        if not os.path.isdir(self.root):
+            return versions
+        for name in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, name)
+            if not os.path.isdir(folder):
+                continue
+            models = sorted(f for f in os.listdir(folder) if f.endswith(".tflite"))
+            if not models:
+                continue
+            labels = os.path.join(folder, "labels.txt")
+            versions[name] = (os.path.join(folder, models[0]), labels if os.path.exists(labels) else CUSTOM_LABELS_PATH)
+        return versions
+
+    def requested_version(self) -> str:
+        """The version named in the ACTIVE file, or None."""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _record_active(self, version: str):
+        if not os.path.isdir(self.root):
+            return
+        path = os.path.join(self.root, ACTIVE_FILE)
+        # Write-then-rename so a watcher never reads a half-written name
+        with open(path + ".tmp", "w") as f:
+            f.write(version + "\n")
+        os.replace(path + ".tmp", path)
+
+    # ── Loading and swapping ─────────────────────────────────
+
+    def load(self, version: str) -> ModelPool:
+        """Build and warm a pool for `version`. Blocking — run it off the event loop."""
+        versions = self.versions()
+        if version not in versions:
+            raise KeyError(f"Unknown model version: {version!r} (available: {', '.join(versions)})")
+        model_path, labels_path = versions[version]
+        # Import the runtime first so its own memory is not charged to this model
+        load_interpreter_class()
+        rss_before = rss_bytes()
+        pool = ModelPool(model_path=model_path, labels_path=labels_path, version=version)
+        try:
+            start = time.perf_counter()
+            pool.warmup()
+            pool.load_timings["warmup"] = time.perf_counter() - start
+        except Exception:
+            pool.close()
+            raise
+        rss_after = rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            # Growth can hide in memory freed earlier (say, by an unloaded model),
+            # so the pool's own estimate stays the floor
+            measured = rss_after - rss_before + (pool.workers.rss_bytes() if pool.workers is not None else 0)
+            pool.memory_bytes = max(pool.memory_bytes, measured)
+        return pool
+
+    def startup_version(self) -> str:
+        version = MODEL_VERSION or self.requested_version() or DEFAULT_VERSION
+        if version not in self.versions():
+            logger.warning(f"Model version {version!r} not found — starting with {DEFAULT_VERSION!r}")
+            version = DEFAULT_VERSION
+        return version
+
+    def start(self) -> asyncio.Task:
+        """Load the startup version in the background; the server stays live (but not ready) meanwhile."""
+        version = self.startup_version()
+        self.loading = version
+        return asyncio.get_running_loop().create_task(self._start(version))
+
+    async def _start(self, version: str) -> ModelPool:
+        try:
+            self.active = await asyncio.to_thread(self.load, version)
+        except Exception as e:
+            self.last_error = f"{version}: {type(e).__name__}: {e}"
+            raise
+        finally:
+            self.loading = None
+        self.history.append((time.time(), f"started {version}"))
+        for other in MODEL_PRELOAD:
+            if other != version:
+                try:
+                    await self.pool_for(other)
+                except Exception as e:
+                    logger.error(f"❌ Failed to preload model version {other!r}: {e}")
+        return self.active
+
+    def active_pool(self) -> ModelPool:
+        """
+        The serving pool. Raises ModelNotReady while the startup load runs
+        (or after it failed); outside the server — scripts, benchmarks — the
+        startup version is loaded right here on first use.
+        """
+        if self.active is None:
+            if self.loading is not None:
+                raise ModelNotReady(f"Model version {self.loading!r} is still loading")
+            if self.last_error is not None:
+                raise ModelNotReady(f"No model loaded — {self.last_error}")
+            version = self.startup_version()
+            self.active = self.load(version)
+            self.history.append((time.time(), f"started {version}"))
+        return self.active
+
+    def start_activation(self, version: str) -> asyncio.Task:
+        """Claim the loader for `version` right away and return the task that loads and swaps it in."""
+        if self.loading is not None:
+            raise RuntimeError(f"Already loading model version {self.loading!r}")
+        self.loading = version
+        self.last_error = None
+        return asyncio.get_running_loop().create_task(self._activate(version))
+
+    async def activate(self, version: str) -> ModelPool:
+        """Load `version` in the background, then swap it in."""
+        return await self.start_activation(version)
+
+    async def _activate(self, version: str) -> ModelPool:
+        try:
+            # Already serving on demand? Then it is loaded and warm — promote it
+            pool = self.resident.pop(version, None) or await asyncio.to_thread(self.load, version)
+        except Exception as e:
+            self.last_error = f"{version}: {type(e).__name__}: {e}"
+            logger.error(f"❌ Failed to load model version {version!r}: {e}")
+            raise
+        finally:
+            self.loading = None
+
+        retired, self.previous, self.active = self.previous, self.active, pool
+        self._record_active(version)
+        self.history.append((time.time(), f"activated {version}"))
+        logger.info(f"🔁 Now serving model version {version!r} (previous: {self.previous.version if self.previous else None})")
+        if retired is not None:
+            self._retire(retired)
+        return pool
+
+    def rollback(self) -> ModelPool:
+        """Swap back to the previous pool — it is still loaded, so this is instant."""
+        if self.previous is None:
+            raise LookupError("No previous model version to roll back to")
+        self.active, self.previous = self.previous, self.active
+        self._record_active(self.active.version)
+        self.history.append((time.time(), f"rolled back to {self.active.version}"))
+        logger.info(f"⏪ Rolled back to model version {self.active.version!r}")
+        return self.active
+
+    def _retire(self, pool: ModelPool, grace_seconds: float = 60.0):
+        """Close a pool once the requests routed to it have released their leases (or after grace_seconds)."""
+        async def drain():
+            deadline = time.monotonic() + grace_seconds
+            while pool.in_flight > 0 and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            await asyncio.to_thread(pool.close)
+            logger.info(f"Closed model version {pool.version!r}")
+
+        task = asyncio.get_running_loop().create_task(drain())
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    # ── Serving several versions ─────────────────────────────
+
+    async def pool_for(self, version: str) -> ModelPool:
+        """The pool serving `version`, loading it on first use. Raises KeyError for unknown versions."""
+        active = self.active_pool()
+        for pool in (active, self.previous):
+            if pool is not None and pool.version == version:
+                return pool
+        pool = self.resident.get(version)
+        if pool is not None:
+            self.resident.move_to_end(version)
+            return pool
+        if version not in self.versions():
+            raise KeyError(f"Unknown model: {version!r} (available: {', '.join(self.versions())})")
+
+        # Concurrent first requests share one load
+        task = self._loads.get(version)
+        if task is None:
+            task = self._loads[version] = asyncio.get_running_loop().create_task(self._load_resident(version))
+            task.add_done_callback(lambda t: self._loads.pop(version, None))
+        return await asyncio.shield(task)
+
+    async def _load_resident(self, version: str) -> ModelPool:
+        try:
+            pool = await asyncio.to_thread(self.load, version)
+        except Exception as e:
+            logger.error(f"❌ Failed to load model version {version!r}: {e}")
+            raise ModelNotReady(f"Model {version!r} failed to load — {type(e).__name__}: {e}") from e
+        self.resident[version] = pool
+        self.history.append((time.time(), f"loaded {version} ({pool.memory_bytes / (1024 * 1024):.0f} MB)"))
+        logger.info(f"📦 Loaded model version {version!r} on demand — {pool.memory_bytes / (1024 * 1024):.1f} MB")
+        self._enforce_budget(keep=version)
+        return pool
+
+    def memory_bytes(self) -> int:
+        return sum(pool.memory_bytes for pool in (self.active, self.previous, *self.resident.values())
+                   if pool is not None)
+
+    def _enforce_budget(self, keep: str = None):
+        """Unload on-demand versions, least recently used first, until the budget is met."""
+        if MODEL_MEMORY_BUDGET_MB <= 0:
+            return
+        budget = MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+        while self.memory_bytes() > budget:
+            victim = next((version for version in self.resident if version != keep), None)
+            if victim is None:
+                # The active and rollback versions are never unloaded
+                logger.warning(f"Models use {self.memory_bytes() / (1024 * 1024):.0f} MB, "
+                               f"over MODEL_MEMORY_BUDGET_MB={MODEL_MEMORY_BUDGET_MB:g}, with nothing left to unload")
+                return
+            pool = self.resident.pop(victim)
+            self.history.append((time.time(), f"unloaded {victim} (memory budget)"))
+            logger.info(f"Unloading model version {victim!r} to stay within the memory budget")
+            self._retire(pool)
+
+    def _labels_on_disk(self, version: str) -> list:
+        """A version's labels file, read without loading the model; [] if it has none."""
+        _, labels_path = self.versions()[version]
+        try:
+            with open(labels_path) as f:
+                return [line.strip() for line in f if line.strip()]
+        except OSError:
+            return []
+
+    async def route(self, model: str = None, crop: str = None) -> tuple:
+        """
+        Pick the pool for a request and the crop to restrict it to: (pool, crop key or None).
+
+        A named model is used as is. For a crop, the active version serves it
+        if it has classes for that crop, then any version already loaded, then
+        one whose labels file lists it. A model whose labels name no crops at
+        all serves every crop, unrestricted. Raises KeyError for an unknown
+        model and LookupError when no model has classes for the crop.
+        """
+        if model is not None:
+            pool = await self.pool_for(model)
+            if crop is None or not pool.crops:
+                return pool, None
+            key = pool.find_crop(crop)
+            if key is None:
+                known = ", ".join(sorted(pool.crops))
+                raise LookupError(f"Model {model!r} has no classes for crop {crop!r} (it knows: {known})")
+            return pool, key
+
+        active = self.active_pool()
+        if crop is None:
+            return active, None
+        for pool in (active, *reversed(self.resident.values())):
+            key = pool.find_crop(crop)
+            if key is not None:
+                if pool is not active:
+                    self.resident.move_to_end(pool.version)
+                return pool, key
+        for version in self.versions():
+            if version in self.resident or version == active.version:
+                continue
+            labels = self._labels_on_disk(version)
+            if find_crop(crop_classes(labels), crop, crop_aliases(labels)) is not None:
+                pool = await self.pool_for(version)
+                return pool, pool.find_crop(crop)
+        if not active.crops:
+            return active, None
+        raise LookupError(f"No model has classes for crop {crop!r}")
+
+    async def watch(self, interval: float = MODEL_REGISTRY_POLL_SECONDS):
+        """Activate whichever version the ACTIVE file names, checking every `interval` seconds."""
+        failed = None
+        while True:
+            await asyncio.sleep(interval)
+            version = self.requested_version()
+            if version is None or self.loading is not None or self.active is None:
+                continue
+            if version == self.active.version or version == failed:
+                continue   # already serving it, or it failed to load — wait for a new name
+            try:
+                await self.activate(version)
+                failed = None
+            except Exception:
+                failed = version   # logged and kept in last_error
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active.version if self.active is not None else None,
+            "previous": self.previous.version if self.previous is not None else None,
+            "resident": {
+                version: {"memory_mb": round(pool.memory_bytes / (1024 * 1024), 1), "crops": sorted(pool.crops)}
+                for version, pool in self.resident.items()
+            },
+            "memory_mb": round(self.memory_bytes() / (1024 * 1024), 1),
+            "memory_budget_mb": MODEL_MEMORY_BUDGET_MB or None,
+            "loading": self.loading,
+            "available": list(self.versions()),
+            "last_error": self.last_error,
+            "history": [
+                {"at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(at)) + "Z", "event": event}
+                for at, event in self.history[-20:]
+            ],
+        }
+
+    def close(self):
+        for pool in (self.active, self.previous, *self.resident.values()):
+            if pool is not None:
+                pool.close()
+        self.active = self.previous = None
+        self.resident.clear()
+
+
+_registry = None
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
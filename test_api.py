@@ -11,6 +11,7 @@ import requests
 import json
 import argparse
 import sys
+import time
 from io import BytesIO
 from PIL import Image
 
@@ -109,6 +110,40 @@ def test_diseases_list():
     except Exception as e:
         print(f"  ❌ FAILED: {e}")
 
+def test_metrics():
+    print_separator("TEST 5: Prometheus Metrics")
+    try:
+        r = requests.get(f"{BASE_URL}/metrics")
+        r.raise_for_status()
+        lines = [l for l in r.text.splitlines() if l.startswith("digital_doctor_stage_seconds_count")]
+        print(f"  ✅ {len(r.text.splitlines())} metric lines")
+        for line in lines:
+            print(f"     {line}")
+    except Exception as e:
+        print(f"  ❌ FAILED: {e}")
+
+def test_jobs():
+    print_separator("TEST 6: Diagnosis Job")
+    try:
+        img = Image.new("RGB", (224, 224), color=(34, 139, 34))
+        buf = BytesIO()
+        img.save(buf, format="JPEG")
+        r = requests.post(f"{BASE_URL}/jobs", files={"image": ("test_green.jpg", buf.getvalue(), "image/jpeg")})
+        r.raise_for_status()
+        job_id = r.json()["id"]
+        print(f"  ✅ Job created: {job_id}")
+        for _ in range(60):
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job["status"] in ("done", "failed"):
+                break
+            time.sleep(0.5)
+        print(f"     Status      : {job['status']}")
+        if job["result"]:
+            print(f"     Disease     : {job['result']['disease']}")
+    except Exception as e:
+        print(f"  ❌ FAILED: {e}")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--image', required=False, help='Path to a crop image to test with')
@@ -119,6 +154,8 @@ if __name__ == "__main__":
     test_model_info()
     test_predict(args.image)
     test_diseases_list()
+    test_metrics()
+    test_jobs()
     print_separator("ALL TESTS DONE")
     print("  If all ✅ — your backend is ready!")
     print("  Connect your React Native app using your PC's IP address\n")
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+📥 Upload Validation — reject bad uploads before they cost memory
+=================================================================
+Our Railway instances are small, so every check here runs as early and as
+cheaply as possible:
+
+  1. Request bodies are counted as they stream in (UploadLimitMiddleware) —
+     an oversized upload gets a 413 without ever being fully received.
+  2. The file type comes from its magic bytes, not the client's content_type.
+  3. Image dimensions are read from the header, so decompression bombs are
+     rejected before a full-resolution buffer is allocated.
+"""
+import io
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image
+
+from config import MAX_UPLOAD_BYTES, MAX_IMAGE_PIXELS
+
+# PIL's own guard: refuse to open anything far beyond our limit, even outside these checks
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image_format(head: bytes):
+    """Return 'JPEG', 'PNG' or 'WEBP' from a file's first bytes, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "JPEG"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "PNG"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+def is_zip(head: bytes) -> bool:
+    return head.startswith(b"PK\x03\x04")
+
+
+def validate_image(data: bytes):
+    """
+    Check an upload is a supported image of sane dimensions, reading only its header.
+
+    Returns None if it is fine, otherwise an error message.
+    """
+    if not data:
+        return "Empty image file received."
+    fmt = sniff_image_format(data[:16])
+    if fmt is None:
+        return "Unsupported file: please upload a JPG, PNG or WebP image."
+    try:
+        # Image.open only parses the header — pixels are decoded later, in the model
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        return f"Image too large: at most {MAX_IMAGE_PIXELS // 1_000_000} megapixels."
+    except Exception:
+        return f"Could not read the {fmt} image header — the file may be corrupt."
+    if width * height > MAX_IMAGE_PIXELS:
+        return f"Image too large: {width}x{height}, at most {MAX_IMAGE_PIXELS // 1_000_000} megapixels."
+    if width < 1 or height < 1:
+        return "Image has no pixels."
+    return None
+
+
+async def read_image_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an UploadFile in chunks up to max_bytes, then validate it. Raises HTTPException."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Image too large: at most {max_bytes // (1024 * 1024)} MB.")
+        chunks.append(chunk)
+    data = b"".join(chunks)
+
+    error = validate_image(data)
+    if error is not None:
+        status = 413 if error.startswith("Image too large") else 400
+        raise HTTPException(status_code=status, detail=error)
+    return data
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping request body size per POST path.
+
+    A declared Content-Length over the limit is answered with 413 before the
+    body is read. Chunked bodies are counted as they arrive and abort with 413
+    as soon as they cross the limit.
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = HTTPException(status_code=413, detail=f"Upload too large: at most {limit // (1024 * 1024)} MB.")
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                await self._reject(send, too_large)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside FastAPI's form parsing, which passes HTTPException through
+                    raise too_large
+            return message
+
+        response_started = False
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e is not too_large or response_started:
+                raise
+            await self._reject(send, too_large)
+
+    @staticmethod
+    async def _reject(send, error: HTTPException):
+        response = JSONResponse(status_code=error.status_code, content={"detail": error.detail},
+                                headers={"Connection": "close"})
+        await response({"type": "http"}, None, send)
@@ -0,0 +1,179 @@
+"""
+⚙️  Inference Workers — one TFLite interpreter per process
+==========================================================
+Lets a single API process drive every core on the box. Preprocessed input
+tensors are written into a shared-memory block of fixed-size slots; only
+(request id, slot index) goes to the workers and only the score vector
+comes back, so image arrays are never pickled.
+"""
+import itertools
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(model_content: bytes, shm_name: str, slots_shape: tuple, dtype: str, num_threads,
+                 tasks, results):
+    """Worker process entry point: attach to the slots and serve tasks until told to stop."""
+    from model import CropDiseaseModel
+
+    try:
+        # Spawned workers share the parent's resource tracker, so the block is
+        # unlinked once, by the parent, in ProcessWorkerPool.close()
+        shm = shared_memory.SharedMemory(name=shm_name)
+        slots = np.ndarray(slots_shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        model = CropDiseaseModel(model_content=model_content, labels=[], num_threads=num_threads)
+    except Exception as e:
+        results.put((None, f"{type(e).__name__}: {e}"))
+        return
+    results.put((None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, slot = task
+        try:
+            scores = model.infer(slots[slot:slot + 1])[0]
+            results.put((request_id, scores))
+        except Exception as e:
+            results.put((request_id, f"{type(e).__name__}: {e}"))
+
+    del slots
+    shm.close()
+
+
+class ProcessWorkerPool:
+    """
+    A fixed set of worker processes, each owning its own Interpreter.
+
+    Callers acquire a slot, write a preprocessed [H, W, 3] input into
+    `slots[slot]`, call run(slot) and release the slot afterwards.
+    """
+
+    def __init__(self, model_content: bytes, input_shape: tuple, input_dtype,
+                 num_workers: int, num_slots: int, timeout: float = 30.0, num_threads: int = None):
+        self.num_workers = max(1, num_workers)
+        self.timeout = timeout
+        dtype = np.dtype(input_dtype)
+        slots_shape = (max(1, num_slots),) + tuple(input_shape)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(slots_shape)) * dtype.itemsize)
+        self.slots = np.ndarray(slots_shape, dtype=dtype, buffer=self.shm.buf)
+        self._free_slots = queue.SimpleQueue()
+        for i in range(slots_shape[0]):
+            self._free_slots.put(i)
+
+        # spawn, not fork: the parent already has interpreter and executor threads running
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._processes = [
+            ctx.Process(
+                target=_worker_main,
+                args=(model_content, self.shm.name, slots_shape, dtype.str, num_threads,
+                      self._tasks, self._results),
+                name=f"inference-worker-{i}",
+                daemon=True,
+            )
+            for i in range(self.num_workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+        try:
+            self._wait_until_ready()
+        except Exception:
+            self.close()
+            raise
+        logger.info(f"Started {self.num_workers} inference worker processes with {slots_shape[0]} input slots")
+
+        self._ids = itertools.count()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+
+    def _wait_until_ready(self, timeout: float = 120.0):
+        """Wait for every worker to load its interpreter, failing fast if one dies."""
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < len(self._processes):
+            try:
+                _, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p.name for p in self._processes if p.exitcode is not None]
+                if dead:
+                    raise RuntimeError(f"Inference worker exited during startup: {', '.join(dead)}")
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Timed out waiting for inference workers to start")
+                continue
+            if error is not None:
+                raise RuntimeError(f"Inference worker failed to start: {error}")
+            ready += 1
+
+    def acquire(self) -> int:
+        """Block until an input slot is free and return its index."""
+        return self._free_slots.get()
+
+    def release(self, slot: int):
+        self._free_slots.put(slot)
+
+    def run(self, slot: int) -> np.ndarray:
+        """Run the input held in `slot` on the next idle worker and return its scores."""
+        request_id = next(self._ids)
+        future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        self._tasks.put((request_id, slot))
+        try:
+            result = future.result(timeout=self.timeout)
+        finally:
+            # A timed-out request's late result is simply dropped by the collector
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+        if isinstance(result, str):
+            raise RuntimeError(f"Inference worker error: {result}")
+        return result
+
+    def _collect(self):
+        while True:
+            item = self._results.get()
+            if item is None:
+                break
+            request_id, result = item
+            with self._pending_lock:
+                future = self._pending.get(request_id)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def rss_bytes(self) -> int:
+        """Combined resident set size of the worker processes (0 where it cannot be read)."""
+        from model import rss_bytes
+        return sum(rss_bytes(p.pid) or 0 for p in self._processes if p.pid is not None)
+
+    def close(self):
+        """Stop the workers and free the shared-memory block."""
+        if self.shm is None:
+            return
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if getattr(self, "_collector", None) is not None:
+            self._results.put(None)
+            self._collector.join(timeout=5)
+        del self.slots
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None